@@ -0,0 +1,281 @@
+import argparse
+import itertools
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from trade_journal import TradeJournal
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+
+def empty_analytics(initial_balance):
+    """Running state for update_analytics; plain JSON so it lives in the account snapshot"""
+    return {
+        'initial_balance': initial_balance,
+        'equity': initial_balance,      # account value after the last closed trade
+        'peak': initial_balance,
+        'max_drawdown': 0.0,            # percent
+        'returns': {'count': 0, 'mean': 0.0, 'm2': 0.0, 'downside': 0.0},
+        'trades': 0,
+        'wins': 0,
+        'gross_profit': 0.0,
+        'gross_loss': 0.0,
+        'fees': 0.0,
+        'hold_time': 0.0,               # seconds, summed over closed trades
+        'exposed_time': 0.0,            # seconds with at least one position open
+        'first_time': None,
+        'last_time': None,
+        'open': {},                     # symbol -> [entry time, margin]
+        'symbols': {}
+    }
+
+
+def epoch_seconds(timestamp):
+    """Journal timestamp string to epoch seconds; naive times are taken as UTC, unparseable ones are NaN"""
+    if not timestamp:
+        return np.nan
+    try:
+        # fromisoformat covers what str(pd.Timestamp) writes and is far cheaper than pandas
+        moment = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        try:
+            moment = pd.Timestamp(timestamp).to_pydatetime()
+        except (TypeError, ValueError, OverflowError):
+            return np.nan
+        if moment is pd.NaT:
+            return np.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def trade_arrays(trades):
+    """Column arrays for a list of journal trades, with symbols as integer codes"""
+    symbols = {}
+    return {
+        'code': np.array([symbols.setdefault(t.get('symbol'), len(symbols)) for t in trades], dtype=int),
+        'symbols': list(symbols),
+        'sell': np.array([t['type'] == 'SELL' for t in trades]),
+        'time': np.array([epoch_seconds(t.get('timestamp')) for t in trades], dtype=float),
+        'balance': np.array([t.get('balance_after', np.nan) for t in trades], dtype=float),
+        'margin': np.array([t.get('margin', 0.0) for t in trades], dtype=float),
+        'profit': np.array([t.get('profit', 0.0) for t in trades], dtype=float),
+        'fee': np.array([t.get('fee', 0.0) for t in trades], dtype=float)
+    }
+
+
+def update_analytics(state, trades):
+    """Fold a chunk of trades (oldest first) into the running state
+
+    Every step is a vectorized pass over the chunk, so a journal of millions of
+    trades streams through in fixed-size chunks and a live trade is a chunk of
+    one. BUYs open a position; statistics move when its SELL closes it.
+    Returns the (times, equity) of the trades this chunk closed.
+    """
+    if not trades:
+        return np.empty(0), np.empty(0)
+    columns = trade_arrays(trades)
+    sell, time = columns['sell'], columns['time']
+    codes, symbols = columns['code'], columns['symbols']
+    n = len(trades)
+
+    # Pair each SELL with its BUY: the previous event of the same symbol in this
+    # chunk, or the position still open from an earlier chunk
+    order = np.argsort(codes, kind='stable')
+    previous = np.full(n, -1)
+    same = np.r_[False, codes[order][1:] == codes[order][:-1]]
+    previous[order[same]] = order[np.flatnonzero(same) - 1]
+    entry_time = np.full(n, np.nan)
+    entry_margin = np.zeros(n)
+    paired = sell & (previous >= 0)
+    paired[paired] = ~sell[previous[paired]]
+    entry_time[paired] = time[previous[paired]]
+    entry_margin[paired] = columns['margin'][previous[paired]]
+    first = sell & (previous < 0)
+    for i in np.flatnonzero(first):
+        entry = state['open'].get(symbols[codes[i]])
+        if entry is not None:
+            entry_time[i] = np.nan if entry[0] is None else entry[0]
+            entry_margin[i] = entry[1]
+            paired[i] = True
+
+    # Margin locked in open positions and how many are open after each event
+    opened = ~sell
+    delta = np.where(opened, columns['margin'], -entry_margin)
+    locked = sum(entry[1] for entry in state['open'].values()) + np.cumsum(delta)
+    count = len(state['open']) + np.cumsum(opened.astype(int) - paired)
+
+    # Time between consecutive trades counts as exposed if a position was open
+    last_time = np.nan if state['last_time'] is None else state['last_time']
+    gaps = np.diff(np.r_[last_time, time])
+    was_open = np.r_[len(state['open']), count[:-1]] > 0
+    state['exposed_time'] += float(np.nansum(gaps[was_open]))
+    known = time[~np.isnan(time)]
+    if len(known):
+        if state['first_time'] is None:
+            state['first_time'] = float(known[0])
+        state['last_time'] = float(known[-1])
+
+    # Equity after each closed trade: free balance plus margin still locked in other positions
+    closed = np.flatnonzero(sell)
+    equity = columns['balance'][closed] + locked[closed]
+    if len(closed):
+        previous_equity = np.r_[state['equity'], equity[:-1]]
+        valid = previous_equity > 0
+        update_returns(state['returns'], equity[valid] / previous_equity[valid] - 1)
+        peak = np.maximum.accumulate(np.maximum(equity, state['peak']))
+        state['max_drawdown'] = max(state['max_drawdown'], float(((peak - equity) / peak).max() * 100))
+        state['peak'] = float(peak[-1])
+        state['equity'] = float(equity[-1])
+
+    profit = columns['profit'][closed]
+    hold = time[closed] - entry_time[closed]
+    state['trades'] += len(closed)
+    state['wins'] += int((profit > 0).sum())
+    state['gross_profit'] += float(profit[profit > 0].sum())
+    state['gross_loss'] -= float(profit[profit <= 0].sum())
+    state['fees'] += float(columns['fee'].sum())
+    state['hold_time'] += float(np.nansum(hold))
+
+    # Per-symbol breakdown
+    k = len(symbols)
+    sell_codes = codes[closed]
+    per_symbol = {
+        'trades': np.bincount(sell_codes, minlength=k),
+        'wins': np.bincount(sell_codes, weights=profit > 0, minlength=k),
+        'profit': np.bincount(sell_codes, weights=profit, minlength=k),
+        'fees': np.bincount(codes, weights=columns['fee'], minlength=k),
+        'hold_time': np.bincount(sell_codes, weights=np.nan_to_num(hold), minlength=k)
+    }
+    for code, symbol in enumerate(symbols):
+        stats = state['symbols'].setdefault(symbol, {'trades': 0, 'wins': 0, 'profit': 0.0,
+                                                     'fees': 0.0, 'hold_time': 0.0})
+        for key, values in per_symbol.items():
+            stats[key] += type(stats[key])(values[code])
+
+    # Positions still open at the end of the chunk
+    last_event = np.zeros(k, dtype=int)
+    np.maximum.at(last_event, codes, np.arange(n))
+    for symbol, last in zip(symbols, last_event):
+        if sell[last]:
+            state['open'].pop(symbol, None)
+        else:
+            state['open'][symbol] = [None if np.isnan(time[last]) else float(time[last]),
+                                     float(columns['margin'][last])]
+
+    return time[closed], equity
+
+
+def update_returns(stats, returns):
+    """Merge a batch into running mean / sum of squared deviations (Chan et al.)"""
+    n = len(returns)
+    if not n:
+        return
+    mean = returns.mean()
+    m2 = ((returns - mean) ** 2).sum()
+    total = stats['count'] + n
+    delta = mean - stats['mean']
+    stats['m2'] += float(m2 + delta ** 2 * stats['count'] * n / total)
+    stats['mean'] += float(delta * n / total)
+    stats['count'] = total
+    stats['downside'] += float((np.minimum(returns, 0) ** 2).sum())
+
+
+def report(state):
+    """Performance statistics from the running state
+
+    Sharpe and Sortino are per closed trade, annualized by the number of trades
+    per year over the journal's time span.
+    """
+    returns = state['returns']
+    trades = state['trades']
+    span = (state['last_time'] - state['first_time']) if state['first_time'] is not None else 0.0
+    scale = math.sqrt(returns['count'] / (span / SECONDS_PER_YEAR)) if span > 0 and returns['count'] else 1.0
+    std = math.sqrt(returns['m2'] / returns['count']) if returns['count'] else 0.0
+    downside = math.sqrt(returns['downside'] / returns['count']) if returns['count'] else 0.0
+    return {
+        'trades': trades,
+        'win_rate': state['wins'] / trades * 100 if trades else 0.0,
+        'total_profit': state['gross_profit'] - state['gross_loss'],
+        'profit_factor': state['gross_profit'] / state['gross_loss'] if state['gross_loss'] else math.inf,
+        'fees': state['fees'],
+        'equity': state['equity'],
+        'return': (state['equity'] - state['initial_balance']) / state['initial_balance'] * 100,
+        'max_drawdown': state['max_drawdown'],
+        'sharpe': returns['mean'] / std * scale if std > 0 else 0.0,
+        'sortino': returns['mean'] / downside * scale if downside > 0 else 0.0,
+        'exposure': state['exposed_time'] / span * 100 if span > 0 else 0.0,
+        'avg_hold_hours': state['hold_time'] / trades / 3600 if trades else 0.0,
+        'symbols': {
+            symbol: {
+                'trades': stats['trades'],
+                'win_rate': stats['wins'] / stats['trades'] * 100 if stats['trades'] else 0.0,
+                'profit': stats['profit'],
+                'fees': stats['fees'],
+                'avg_hold_hours': stats['hold_time'] / stats['trades'] / 3600 if stats['trades'] else 0.0
+            }
+            for symbol, stats in state['symbols'].items()
+        }
+    }
+
+
+def analyze_trades(trades, initial_balance, chunk_size=100_000, equity_file=None):
+    """Stream an iterable of trades through update_analytics in bounded memory
+
+    The equity curve is written to equity_file (CSV) chunk by chunk if given.
+    """
+    state = empty_analytics(initial_balance)
+    trades = iter(trades)
+    while True:
+        chunk = list(itertools.islice(trades, chunk_size))
+        if not chunk:
+            return state
+        times, equity = update_analytics(state, chunk)
+        if equity_file is not None:
+            np.savetxt(equity_file, np.column_stack([times, equity]), fmt=['%.0f', '%.2f'], delimiter=',')
+
+
+def print_report(stats):
+    print("\n=== Performance ===")
+    print(f"Trades: {stats['trades']}")
+    print(f"Win Rate: {stats['win_rate']:.2f}%")
+    print(f"Total Profit: ₹{stats['total_profit']:,.2f}")
+    print(f"Profit Factor: {stats['profit_factor']:.2f}")
+    print(f"Fees: ₹{stats['fees']:,.2f}")
+    print(f"Equity: ₹{stats['equity']:,.2f} ({stats['return']:+.2f}%)")
+    print(f"Max Drawdown: {stats['max_drawdown']:.2f}%")
+    print(f"Sharpe: {stats['sharpe']:.2f}")
+    print(f"Sortino: {stats['sortino']:.2f}")
+    print(f"Exposure: {stats['exposure']:.1f}%")
+    print(f"Average Hold: {stats['avg_hold_hours']:.1f}h")
+    if stats['symbols']:
+        print(f"\n{'symbol':<12}{'trades':>8}{'win %':>8}{'profit':>16}{'fees':>12}{'hold h':>8}")
+        for symbol, s in sorted(stats['symbols'].items(), key=lambda item: -item[1]['profit']):
+            print(f"{symbol:<12}{s['trades']:>8}{s['win_rate']:>8.1f}{s['profit']:>16,.2f}"
+                  f"{s['fees']:>12,.2f}{s['avg_hold_hours']:>8.1f}")
+    print("===================\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Performance statistics from the trade journal')
+    parser.add_argument('journal', nargs='?', default='trade_journal.jsonl')
+    parser.add_argument('--initial-balance', type=float, default=10000)
+    parser.add_argument('--chunk-size', type=int, default=100_000, help='trades folded in per vectorized pass')
+    parser.add_argument('--equity', help='write the equity curve (epoch seconds, equity) to this CSV file')
+    args = parser.parse_args()
+
+    journal = TradeJournal(args.journal)
+    if args.equity:
+        with open(args.equity, 'w') as f:
+            f.write('time,equity\n')
+            state = analyze_trades(journal.trades(), args.initial_balance, args.chunk_size, f)
+    else:
+        state = analyze_trades(journal.trades(), args.initial_balance, args.chunk_size)
+    print_report(report(state))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS, BarStore
+
+# Fixed-width little-endian records; time is nanoseconds since the epoch (UTC)
+BAR_RECORD = np.dtype([('time', '<i8')] + [(column, '<f8') for column in COLUMNS])
+TICK_RECORD = np.dtype([('time', '<i8'), ('Price', '<f8'), ('Size', '<f8')])
+RECORDS = {'bar': BAR_RECORD, 'tick': TICK_RECORD}
+
+# One sparse index entry per this many records
+INDEX_STRIDE = 1024
+
+# Column names accepted by the importer, lower-cased, for each archive column
+ALIASES = {
+    'time': ['time', 'timestamp', 'datetime', 'date', 'open_time'],
+    'Open': ['open', 'o'],
+    'High': ['high', 'h'],
+    'Low': ['low', 'l'],
+    'Close': ['close', 'c', 'price'],
+    'Volume': ['volume', 'v', 'size'],
+    'Price': ['price', 'close'],
+    'Size': ['size', 'volume', 'qty', 'quantity']
+}
+
+
+class BarArchive:
+    """Memory-mapped archive of fixed-width records, one file per symbol, interval and month
+
+    archive/<symbol>/<interval>/<YYYY-MM>.bin holds records sorted by time, with
+    every INDEX_STRIDE-th timestamp in <YYYY-MM>.idx.npy. A range lookup
+    binary-searches the small sparse index, then one block of the mapped file,
+    so it only touches a few pages. Reads within a month return views of the
+    mapped file without copying; a range over several months is concatenated.
+    Ticks use the same layout with kind='tick'.
+    """
+
+    def __init__(self, root='archive', kind='bar'):
+        self.root = root
+        self.kind = kind
+        self.record = RECORDS[kind]
+        self.maps = {}
+        self.indexes = {}
+
+    def directory(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def path(self, symbol, interval, month):
+        return os.path.join(self.directory(symbol, interval), f"{month}.bin")
+
+    def months(self, symbol, interval):
+        """Sorted list of archived months, as YYYY-MM"""
+        directory = self.directory(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.bin'))
+
+    def tz(self, symbol, interval):
+        """Timezone the bars were imported with, used for the index of frame()"""
+        try:
+            with open(os.path.join(self.directory(symbol, interval), 'meta.json')) as f:
+                return json.load(f).get('tz', 'UTC')
+        except (OSError, json.JSONDecodeError):
+            return 'UTC'
+
+    def open(self, symbol, interval, month):
+        """Read-only memory map of one month's records
+
+        A file cut short by a crash mid-append is truncated to its whole records.
+        """
+        path = self.path(symbol, interval, month)
+        records = self.maps.get(path)
+        if records is None:
+            size = os.path.getsize(path)
+            n = size // self.record.itemsize
+            if size % self.record.itemsize:
+                print(f"Dropping a partial record at the end of {path}")
+                try:
+                    os.truncate(path, n * self.record.itemsize)
+                except OSError:
+                    # Read-only archive: the map below still covers whole records only
+                    pass
+            if n == 0:
+                records = np.empty(0, dtype=self.record)
+            else:
+                records = np.memmap(path, dtype=self.record, mode='r', shape=(n,))
+            self.maps[path] = records
+        return records
+
+    def index(self, symbol, interval, month):
+        """A month's sparse index, rebuilt when it is missing or does not match the records"""
+        path = self.path(symbol, interval, month)[:-4] + '.idx.npy'
+        index = self.indexes.get(path)
+        if index is None:
+            times = self.open(symbol, interval, month)['time']
+            try:
+                index = np.load(path)
+            except (OSError, ValueError):
+                index = None
+            if (index is None or len(index) != math.ceil(len(times) / INDEX_STRIDE)
+                    or (len(index) and (index[0] != times[0] or index[-1] != times[(len(index) - 1) * INDEX_STRIDE]))):
+                index = self.write_index(symbol, interval, month)
+            self.indexes[path] = index
+        return index
+
+    def locate(self, symbol, interval, month, timestamp):
+        """Position of the first record at or after timestamp (ns) in one month"""
+        records = self.open(symbol, interval, month)
+        index = self.index(symbol, interval, month)
+        block = int(np.searchsorted(index, timestamp))
+        low = max(block - 1, 0) * INDEX_STRIDE
+        high = min(block * INDEX_STRIDE + 1, len(records))
+        return low + int(np.searchsorted(records['time'][low:high], timestamp))
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Records in [start, end) as a structured array; a view of the file within one month"""
+        months = self.months(symbol, interval)
+        start_ns = end_ns = None
+        if start is not None:
+            start = BarStore.to_utc(start)
+            start_ns, first_month = start.value, start.strftime('%Y-%m')
+            months = [m for m in months if m >= first_month]
+        if end is not None:
+            end = BarStore.to_utc(end)
+            end_ns, last_month = end.value, end.strftime('%Y-%m')
+            months = [m for m in months if m <= last_month]
+
+        parts = []
+        for month in months:
+            records = self.open(symbol, interval, month)
+            first = self.locate(symbol, interval, month, start_ns) if start_ns is not None else 0
+            last = self.locate(symbol, interval, month, end_ns) if end_ns is not None else len(records)
+            if last > first:
+                parts.append(records[first:last])
+        if not parts:
+            return np.empty(0, dtype=self.record)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def columns(self, symbol, interval, start=None, end=None):
+        """{'time': int64 ns, 'Open': ..., ...}; strided views of the records, no copy"""
+        records = self.read(symbol, interval, start, end)
+        return {name: records[name] for name in self.record.names}
+
+    def frame(self, symbol, interval, start=None, end=None):
+        """Records in [start, end) as a DataFrame, as BarStore.read returns them"""
+        records = self.read(symbol, interval, start, end)
+        index = pd.DatetimeIndex(records['time'].view('datetime64[ns]')).tz_localize('UTC')
+        tz = self.tz(symbol, interval)
+        if tz != 'UTC':
+            index = index.tz_convert(tz)
+        return pd.DataFrame({name: records[name] for name in self.record.names[1:]}, index=index)
+
+    def get_bars(self, symbol, interval, start, end):
+        """Data-source interface, so AlgoTrader, Backtester or Replay can read from the archive"""
+        return self.frame(symbol, interval, start, end)
+
+    def last_timestamp(self, symbol, interval):
+        months = self.months(symbol, interval)
+        for month in reversed(months):
+            records = self.open(symbol, interval, month)
+            if len(records):
+                return pd.Timestamp(int(records['time'][-1]), tz='UTC')
+        return None
+
+    def write(self, symbol, interval, df):
+        """Merge a DataFrame into the monthly files; newer rows replace archived ones"""
+        df = normalize(df, self.record.names[1:])
+        records = self.to_records(df)
+        if not len(records):
+            return 0
+        directory = self.directory(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        if str(df.index.tz) != 'UTC':
+            with open(os.path.join(directory, 'meta.json'), 'w') as f:
+                json.dump({'tz': str(df.index.tz)}, f)
+
+        months = records['time'].view('datetime64[ns]').astype('datetime64[M]')
+        bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True])
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            self.write_month(symbol, interval, str(months[first]), records[first:last])
+        return len(records)
+
+    def write_month(self, symbol, interval, month, records):
+        path = self.path(symbol, interval, month)
+        existing = self.open(symbol, interval, month) if os.path.exists(path) else None
+        # Drop the maps before the file changes under them
+        self.maps.pop(path, None)
+        if existing is not None and len(existing) and records['time'][0] > existing['time'][-1]:
+            # The common case, newer bars: append in place after the last whole record
+            size = len(existing) * self.record.itemsize
+            del existing
+            data = records.tobytes()
+            try:
+                with open(path, 'r+b') as f:
+                    f.seek(size)
+                    f.write(data)
+                    f.truncate()
+                    if f.tell() != size + len(data):
+                        raise OSError(f"Short write to {path}")
+            except BaseException:
+                # Roll back to the records that were there before
+                os.truncate(path, size)
+                raise
+        else:
+            if existing is not None and len(existing):
+                records = self.merge(np.array(existing), records)
+            del existing
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(records.tobytes())
+            os.replace(tmp_path, path)
+        self.write_index(symbol, interval, month)
+
+    def write_index(self, symbol, interval, month):
+        """Rebuild a month's sparse index: every INDEX_STRIDE-th timestamp"""
+        path = self.path(symbol, interval, month)[:-4] + '.idx.npy'
+        self.indexes.pop(path, None)
+        index = np.array(self.open(symbol, interval, month)['time'][::INDEX_STRIDE])
+        tmp_path = path[:-4] + '.tmp.npy'
+        np.save(tmp_path, index)
+        os.replace(tmp_path, path)
+        return index
+
+    @staticmethod
+    def merge(existing, records):
+        """Union of two record arrays sorted by time; for equal times the newer record wins"""
+        merged = np.concatenate([existing, records])
+        merged = merged[np.argsort(merged['time'], kind='stable')]
+        times = merged['time']
+        return merged[np.r_[times[1:] != times[:-1], True]]
+
+    def to_records(self, df):
+        """Fixed-width records from a normalized frame, sorted and deduplicated"""
+        records = np.empty(len(df), dtype=self.record)
+        records['time'] = df.index.tz_convert('UTC').as_unit('ns').asi8
+        for name in self.record.names[1:]:
+            records[name] = df[name].to_numpy(dtype=float)
+        return self.merge(records[:0], records)
+
+
+def normalize(df, names):
+    """Map CSV / Parquet / yfinance column layouts onto the archive's columns with a UTC index"""
+    if isinstance(df.columns, pd.MultiIndex):
+        # yfinance returns ('Close', 'BTC-USD') style columns
+        df = df.droplevel(list(range(1, df.columns.nlevels)), axis=1)
+    lower = {str(column).strip().lower(): column for column in df.columns}
+
+    if not isinstance(df.index, pd.DatetimeIndex):
+        time_column = next((lower[alias] for alias in ALIASES['time'] if alias in lower), None)
+        if time_column is None:
+            raise ValueError("No time column found; expected one of " + ', '.join(ALIASES['time']))
+        values = df[time_column]
+        if pd.api.types.is_numeric_dtype(values):
+            # Epoch numbers: pick the unit from the magnitude
+            peak = values.abs().max()
+            unit = 's' if peak < 1e11 else 'ms' if peak < 1e14 else 'us' if peak < 1e17 else 'ns'
+            index = pd.to_datetime(values, unit=unit, utc=True)
+        else:
+            index = pd.to_datetime(values, utc=True, format='ISO8601')
+        df = df.set_index(pd.DatetimeIndex(index))
+    if df.index.tz is None:
+        df = df.tz_localize('UTC')
+
+    columns = {}
+    for name in names:
+        source = next((lower[alias] for alias in [name.lower()] + ALIASES.get(name, []) if alias in lower), None)
+        if source is None:
+            if name in ('Volume', 'Size'):
+                columns[name] = np.zeros(len(df))
+                continue
+            raise ValueError(f"No {name} column found")
+        columns[name] = pd.to_numeric(df[source], errors='coerce').to_numpy(dtype=float)
+    out = pd.DataFrame(columns, index=df.index)
+    return out.dropna(how='all', subset=[name for name in names if name not in ('Volume', 'Size')])
+
+
+def read_table(path, chunksize=1_000_000):
+    """Yield frames from a CSV (in chunks) or Parquet file"""
+    if path.endswith('.parquet') or path.endswith('.pq'):
+        # Needs pyarrow or fastparquet installed
+        yield pd.read_parquet(path)
+        return
+    with open(path) as f:
+        head = [f.readline() for _ in range(3)]
+    # yfinance writes a three-line header: Price / Ticker / Datetime
+    if len(head) > 1 and head[1].startswith('Ticker'):
+        yield from pd.read_csv(path, skiprows=[1, 2], index_col=0, parse_dates=False, chunksize=chunksize)
+        return
+    yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def import_file(archive, symbol, interval, path):
+    """Bulk import a CSV or Parquet file; returns the number of records written"""
+    total = 0
+    for chunk in read_table(path):
+        if not isinstance(chunk.index, pd.RangeIndex):
+            # The first column was the index (yfinance CSV): parse it as times
+            chunk.index = pd.DatetimeIndex(pd.to_datetime(chunk.index, utc=True, format='ISO8601'))
+        total += archive.write(symbol, interval, chunk)
+    return total
+
+
+def import_source(archive, symbol, interval, source, start, end):
+    """Import bars from a data source with fetch(), e.g. YahooSource or YahooChartSource, a month at a time"""
+    total = 0
+    for month_start in pd.date_range(BarStore.to_utc(start).floor('D'), BarStore.to_utc(end), freq='MS').union(
+            [BarStore.to_utc(start)]):
+        month_end = min(month_start + pd.offsets.MonthBegin(1), BarStore.to_utc(end))
+        if month_start < month_end:
+            total += archive.write(symbol, interval, source.fetch(symbol, interval, month_start, month_end))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory-mapped bar archive')
+    parser.add_argument('--root', default='archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help='bulk import CSV / Parquet files or download from Yahoo')
+    importer.add_argument('symbol')
+    importer.add_argument('interval')
+    importer.add_argument('files', nargs='*')
+    importer.add_argument('--yahoo', action='store_true', help='download from Yahoo through yfinance')
+    importer.add_argument('--start', help='first day to download')
+    importer.add_argument('--end', help='day after the last to download (default: now)')
+
+    info = commands.add_parser('info', help='archived months and record counts')
+    info.add_argument('symbol')
+    info.add_argument('interval')
+    args = parser.parse_args()
+
+    archive = BarArchive(args.root)
+    if args.command == 'import':
+        total = 0
+        for path in args.files:
+            total += import_file(archive, args.symbol, args.interval, path)
+        if args.yahoo:
+            from bar_store import YahooSource
+            if not args.start:
+                parser.error('--yahoo needs --start')
+            end = args.end or pd.Timestamp.now(tz='UTC')
+            total += import_source(archive, args.symbol, args.interval, YahooSource(), args.start, end)
+        print(f"Imported {total:,} records into {archive.directory(args.symbol, args.interval)}")
+    else:
+        for month in archive.months(args.symbol, args.interval):
+            records = archive.open(args.symbol, args.interval, month)
+            span = (f"{pd.Timestamp(int(records['time'][0]), tz='UTC')} - {pd.Timestamp(int(records['time'][-1]), tz='UTC')}"
+                    if len(records) else 'empty')
+            print(f"{month}  {len(records):>9,}  {span}")
+
+
+if __name__ == '__main__':
+    main()
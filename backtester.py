@@ -0,0 +1,330 @@
+import numpy as np
+import sys
+
+from analytics import analyze_trades, report
+from fill_simulator import BUY, SELL
+from risk import FIXED
+from trading_bot import AlgoTrader
+
+# Bars per year for annualizing; crypto trades around the clock
+BARS_PER_YEAR = {
+    '1m': 525600,
+    '5m': 105120,
+    '15m': 35040,
+    '30m': 17520,
+    '1h': 8760,
+    '4h': 2190,
+    '1d': 365
+}
+
+
+class Backtester(AlgoTrader):
+    """Replay a strategy config over a full price history in one vectorized pass"""
+
+    def __init__(self, config):
+        super().__init__(config)
+
+    def load_account_state(self, initial_balance):
+        """Start every backtest from a fresh in-memory account"""
+        return {
+            'balance': initial_balance,
+            'positions': {},
+            'trade_history': []
+        }
+
+    def save_account_state(self, account_state):
+        """Backtests never touch paper_account.json"""
+        pass
+
+    def signal_arrays(self, df, indicator_cache=None):
+        """Compute indicators, then per-bar entry and indicator exit flags as NumPy arrays"""
+        df = self.calculate_indicators(df, indicator_cache)
+        signals = self.rules.evaluate(df)
+
+        # High and ATR feed the trailing stop, which depends on the entry and is
+        # followed per position in find_exit
+        return {
+            'index': df.index,
+            'close': df['Close'].to_numpy(dtype=float),
+            'high': df['High'].to_numpy(dtype=float),
+            'atr': df['atr'].to_numpy(dtype=float),
+            'volume': df['Volume'].to_numpy(dtype=float),
+            'entries': signals['entries'],
+            'exits': signals['exits']
+        }
+
+    def find_exit(self, start, entry_price, close, exits, trail=None):
+        """Return the first bar at or after start where the position is sold, or -1
+
+        trail is (high, atr, highest, stop): the bar arrays and the position's
+        trailing stop state at entry, advanced bar by bar as check_stop_loss does live.
+        """
+        profit_target = self.config['profit_target']
+        stop_loss = self.config['stop_loss']
+        n = len(close)
+
+        if trail is not None:
+            high, atr, highest, stop = trail
+
+        # Most holds are short: scan the first few bars without NumPy call overhead
+        for i in range(start, min(n, start + 8)):
+            price = close[i]
+            if (exits[i] or
+                    ((price - entry_price) / entry_price) * 100 >= profit_target or
+                    ((entry_price - price) / entry_price) * 100 >= stop_loss):
+                return i
+            if trail is not None:
+                highest = max(highest, high[i])
+                level = self.risk.trail_level(highest, atr[i])
+                # Ratchet up; NaN (no level yet) never replaces a stop
+                if stop != stop or level > stop:
+                    stop = level
+                if price <= stop:
+                    return i
+
+        chunk = 64
+        i = start + 8
+        while i < n:
+            end = min(n, i + chunk)
+            window = close[i:end]
+            profit_pct = ((window - entry_price) / entry_price) * 100
+            loss_pct = ((entry_price - window) / entry_price) * 100
+            hit = (exits[i:end] |
+                   (profit_pct >= profit_target) |
+                   (loss_pct >= stop_loss))
+            if trail is not None:
+                # Running high since entry and a stop that only ratchets up
+                highs = np.maximum.accumulate(np.fmax(high[i:end], highest))
+                stops = np.fmax.accumulate(np.fmax(self.risk.trail(highs, atr[i:end]), stop))
+                hit |= window <= stops
+                highest, stop = highs[-1], stops[-1]
+            j = hit.argmax()
+            if hit[j]:
+                return i + j
+            # Grow the search window so long holds stay O(n) overall
+            i = end
+            chunk *= 2
+        return -1
+
+    def record_trade(self, trade_data):
+        """Keep trades in memory instead of writing trade_results.json"""
+        self.account['trade_history'].append(trade_data)
+
+    def buy(self, price, timestamp, volume=None, atr=np.nan):
+        """Open a position exactly like execute_trade does"""
+        position_size = self.position_size(price, atr)
+        if position_size <= 0:
+            return False
+        bar_price = price
+        fill = self.fill_simulator.market_fill(self.symbol, BUY, position_size, price, volume)
+        price = fill['price']
+        margin_required = (position_size * price) / self.leverage
+
+        if margin_required + fill['fee'] > self.account['balance']:
+            return False
+
+        self.account['balance'] -= margin_required + fill['fee']
+        self.account['positions'][self.symbol] = {
+            'size': position_size,
+            'entry_price': price,
+            'stop_loss': price * (1 - self.config['stop_loss']/100),
+            'margin': margin_required,
+            'leverage': self.leverage,
+            'entry_fee': fill['fee']
+        }
+        self.risk.open_trail(self.account['positions'][self.symbol], bar_price, atr, timestamp or 0)
+        self.record_trade({
+            'timestamp': str(timestamp),
+            'symbol': self.symbol,
+            'type': 'BUY',
+            'price': price,
+            'size': position_size,
+            'leverage': self.leverage,
+            'margin': margin_required,
+            'position_value': position_size * price,
+            'fee': fill['fee'],
+            'balance_after': self.account['balance']
+        })
+        return True
+
+    def sell(self, price, timestamp, volume=None):
+        """Close the open position exactly like execute_trade does"""
+        position = self.account['positions'].pop(self.symbol)
+        fill = self.fill_simulator.market_fill(self.symbol, SELL, position['size'], price, volume)
+        price = fill['price']
+        close_price = position['size'] * price
+        entry_value = position['size'] * position['entry_price']
+        leveraged_profit = (close_price - entry_value) * self.leverage - fill['fee']
+
+        self.account['balance'] += position['margin'] + leveraged_profit
+        self.record_trade({
+            'timestamp': str(timestamp),
+            'symbol': self.symbol,
+            'type': 'SELL',
+            'price': price,
+            'size': position['size'],
+            'leverage': self.leverage,
+            'profit': leveraged_profit - position['entry_fee'],
+            'fee': fill['fee'],
+            'balance_after': self.account['balance']
+        })
+
+    def backtest(self, df, indicator_cache=None):
+        """Run the strategy over every bar of df and return trades and summary"""
+        return self.simulate(self.signal_arrays(df, indicator_cache))
+
+    def simulate(self, arrays, start=0, end=None, timestamps=True):
+        """Simulate fills on bars [start, end) of precomputed signal arrays"""
+        self.account = self.load_account_state(self.config['initial_balance'])
+        end = len(arrays['close']) if end is None else end
+        close = arrays['close'][:end]
+        exits = arrays['exits'][:end]
+        volume = arrays.get('volume')
+        atr = arrays.get('atr')
+        trailing = self.config['trailing_stop'] and atr is not None
+        index = arrays['index']
+        entry_bars = np.flatnonzero(arrays['entries'][start:end]) + start
+        fills = []
+
+        bar = start
+        while True:
+            # Next bar with a buy signal while flat
+            k = np.searchsorted(entry_bars, bar)
+            if k >= len(entry_bars):
+                break
+            entry_bar = entry_bars[k]
+            if not self.buy(float(close[entry_bar]), None, self.bar_volume(volume, entry_bar),
+                            np.nan if atr is None else float(atr[entry_bar])):
+                if self.risk.sizing == FIXED:
+                    # The balance cannot change while flat, so no later entry can fill either
+                    break
+                # ATR sizing differs per bar, so a later entry may still fit
+                bar = entry_bar + 1
+                continue
+            # Targets and stops are measured from the fill price, as check_stop_loss does live
+            position = self.account['positions'][self.symbol]
+            entry_price = position['entry_price']
+            trail = None
+            if trailing:
+                stop = position['trailing_stop']
+                trail = (arrays['high'], atr, position['highest'], np.nan if stop is None else stop)
+
+            # Sell rules are evaluated from the next bar on
+            exit_bar = self.find_exit(entry_bar + 1, entry_price, close, exits, trail)
+            fills.append((entry_bar, exit_bar))
+            if exit_bar < 0:
+                break
+            self.sell(float(close[exit_bar]), None, self.bar_volume(volume, exit_bar))
+            bar = exit_bar + 1
+
+        # Format every trade timestamp in one vectorized pass
+        if timestamps:
+            bars = [b for fill in fills for b in fill if b >= 0]
+            for trade, timestamp in zip(self.account['trade_history'], index[bars].astype(str)):
+                trade['timestamp'] = timestamp
+
+        return {
+            'trades': self.account['trade_history'],
+            'summary': self.summarize(),
+            'final_balance': self.account['balance'],
+            'open_position': self.account['positions'].get(self.symbol),
+            'fills': fills,
+            'equity': self.equity_curve(close[start:], fills, start)
+        }
+
+    @staticmethod
+    def bar_volume(volume, bar):
+        return None if volume is None else float(volume[bar])
+
+    def equity_curve(self, close, fills, start=0):
+        """Mark-to-market account value (cash + margin + open P&L) on every bar"""
+        equity = np.empty(len(close))
+        trades = self.account['trade_history']
+        cash = self.config['initial_balance']
+        bar = 0
+        for k, (entry_bar, exit_bar) in enumerate(fills):
+            entry_bar -= start
+            buy = trades[2 * k]
+            equity[bar:entry_bar] = cash
+            stop = len(close) if exit_bar < 0 else exit_bar - start
+            held = close[entry_bar:stop]
+            equity[entry_bar:stop] = (buy['balance_after'] + buy['margin'] +
+                                      buy['size'] * (held - buy['price']) * self.leverage)
+            if exit_bar < 0:
+                return equity
+            cash = trades[2 * k + 1]['balance_after']
+            bar = stop
+        equity[bar:] = cash
+        return equity
+
+    def summarize(self):
+        """Build the same summary save_trade_results keeps"""
+        profits = np.array([t['profit'] for t in self.account['trade_history']
+                            if t['type'] == 'SELL'], dtype=float)
+        total_trades = len(profits)
+        winning_trades = int((profits > 0).sum())
+        return {
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'losing_trades': total_trades - winning_trades,
+            'total_profit': float(profits.sum()),
+            'win_rate': (winning_trades / total_trades) * 100 if total_trades else 0
+        }
+
+    def metrics(self, results):
+        """Return, drawdown, Sharpe and trade count from a simulate() result"""
+        equity = results['equity']
+        initial = self.config['initial_balance']
+        if len(equity) == 0:
+            return {'return': 0.0, 'max_drawdown': 0.0, 'sharpe': 0.0,
+                    'trades': results['summary']['total_trades']}
+        peak = np.maximum.accumulate(np.maximum(equity, initial))
+        drawdown = ((peak - equity) / peak).max() * 100
+        previous = np.r_[initial, equity[:-1]]
+        # Returns stop meaning anything once the account is wiped out
+        ruined = np.flatnonzero(previous <= 0)
+        stop = ruined[0] if len(ruined) else len(equity)
+        returns = (equity[:stop] - previous[:stop]) / previous[:stop]
+        std = returns.std()
+        periods = BARS_PER_YEAR.get(self.timeframe, 8760)
+        sharpe = returns.mean() / std * np.sqrt(periods) if std > 0 else 0.0
+        return {
+            'return': (equity[-1] - initial) / initial * 100,
+            'max_drawdown': drawdown,
+            'sharpe': sharpe,
+            'trades': results['summary']['total_trades']
+        }
+
+    def print_results(self, results):
+        """Print a backtest summary with INR formatting"""
+        summary = results['summary']
+        metrics = self.metrics(results)
+        stats = report(analyze_trades(results['trades'], self.config['initial_balance']))
+        print("\n=== Backtest Results ===")
+        print(f"Symbol: {self.symbol} ({self.timeframe})")
+        print(f"Trades: {summary['total_trades']}")
+        print(f"Win Rate: {summary['win_rate']:.2f}%")
+        print(f"Total Profit: ₹{summary['total_profit']:,.2f}")
+        print(f"Final Balance: ₹{results['final_balance']:,.2f}")
+        print(f"Max Drawdown: {metrics['max_drawdown']:.2f}%")
+        print(f"Sharpe: {metrics['sharpe']:.2f}")
+        print(f"Sortino (per trade): {stats['sortino']:.2f}")
+        print(f"Exposure: {stats['exposure']:.1f}%")
+        print(f"Average Hold: {stats['avg_hold_hours']:.1f}h")
+        print(f"Fees: ₹{stats['fees']:,.2f}")
+        if results['open_position']:
+            print(f"Open Position Entry: ₹{results['open_position']['entry_price']:,.2f}")
+        print("========================\n")
+
+
+if __name__ == '__main__':
+    # Usage: python backtester.py [conservative|aggressive]
+    profile = sys.argv[1] if len(sys.argv) > 1 else 'conservative'
+    if profile == 'aggressive':
+        from aggressive_config import CONFIG
+    else:
+        from conservative_config import CONFIG
+
+    backtester = Backtester(CONFIG)
+    results = backtester.backtest(backtester.get_historical_data())
+    backtester.print_results(results)
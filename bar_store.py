@@ -0,0 +1,277 @@
+import os
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400
+}
+
+# Longest span Yahoo serves in one intraday request
+MAX_REQUEST_DAYS = {'1m': 7}
+
+# Exchanges whose intraday bars start at the session open rather than on the UTC hour,
+# by Yahoo symbol suffix: NSE and BSE hourly bars start at 09:15, 10:15, ... IST
+SESSION_OPEN = {'.NS': ('Asia/Kolkata', '09:15'), '.BO': ('Asia/Kolkata', '09:15')}
+
+
+def bucket_origin(symbol):
+    """Epoch nanoseconds intraday buckets are aligned to: the symbol's session open, else 0"""
+    for suffix, (tz, open_time) in SESSION_OPEN.items():
+        if symbol and symbol.endswith(suffix):
+            return pd.Timestamp(f"1970-01-02 {open_time}", tz=tz).value
+    return 0
+
+
+def bucket_starts(index, interval, origin=0):
+    """Start of the interval each timestamp falls in, as nanoseconds since the epoch
+
+    Intraday buckets are aligned to origin (see bucket_origin), so an hour can
+    start at :15 for exchanges that open then.
+    """
+    if interval == '1d':
+        # Daily bars start at midnight in the index's own timezone
+        return index.normalize().as_unit('ns').asi8
+    width = INTERVAL_SECONDS[interval] * 1_000_000_000
+    stamps = index.as_unit('ns').asi8
+    return stamps - (stamps - origin) % width
+
+
+def resample_bars(df, interval, origin=0):
+    """Aggregate bars into a coarser interval: first open, highest high, lowest low,
+    last close and summed volume; the last bar may still be forming"""
+    if df.empty:
+        return df[COLUMNS]
+    buckets = bucket_starts(df.index, interval, origin)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    index = pd.DatetimeIndex(buckets[starts].view('datetime64[ns]'))
+    if df.index.tz is not None:
+        index = index.tz_localize('UTC').tz_convert(df.index.tz)
+    return pd.DataFrame({
+        'Open': df['Open'].to_numpy(dtype=float)[starts],
+        'High': np.fmax.reduceat(df['High'].to_numpy(dtype=float), starts),
+        'Low': np.fmin.reduceat(df['Low'].to_numpy(dtype=float), starts),
+        'Close': df['Close'].to_numpy(dtype=float)[ends],
+        'Volume': np.add.reduceat(np.nan_to_num(df['Volume'].to_numpy(dtype=float)), starts)
+    }, index=index)
+
+
+class YahooSource:
+    """Fetch OHLCV bars from Yahoo Finance"""
+
+    def __init__(self):
+        self.tickers = {}
+
+    def fetch(self, symbol, interval, start, end):
+        import yfinance as yf
+        if symbol not in self.tickers:
+            self.tickers[symbol] = yf.Ticker(symbol)
+        ticker = self.tickers[symbol]
+
+        # Long 1m ranges have to be requested a few days at a time
+        step = pd.Timedelta(days=MAX_REQUEST_DAYS.get(interval, 100_000))
+        frames = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(end, chunk_start + step)
+            df = ticker.history(start=chunk_start, end=chunk_end, interval=interval)
+            if not df.empty:
+                frames.append(df[COLUMNS])
+            chunk_start = chunk_end
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        df = pd.concat(frames)
+        return df[~df.index.duplicated(keep='last')]
+
+
+class FrameSource:
+    """Serve bars from an in-memory DataFrame, a local stand-in for Yahoo"""
+
+    def __init__(self, frames):
+        # frames: {(symbol, interval): DataFrame} or a single DataFrame for any symbol
+        self.frames = frames
+        self.calls = []
+
+    def fetch(self, symbol, interval, start, end):
+        self.calls.append((symbol, interval, start, end))
+        df = self.frames if isinstance(self.frames, pd.DataFrame) else self.frames[(symbol, interval)]
+        start = BarStore.to_utc(start)
+        end = BarStore.to_utc(end)
+        return df[(df.index >= start) & (df.index < end)][COLUMNS]
+
+
+class BarStore:
+    """Columnar OHLCV files partitioned as root/symbol/interval/YYYY-MM-DD.npz"""
+
+    def __init__(self, root='data_cache'):
+        self.root = root
+
+    def partition_dir(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def partition_days(self, symbol, interval):
+        """Sorted list of cached days"""
+        path = self.partition_dir(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(path) if name.endswith('.npz'))
+
+    def load_partition(self, symbol, interval, day):
+        path = os.path.join(self.partition_dir(symbol, interval), f"{day}.npz")
+        with np.load(path) as data:
+            index = pd.to_datetime(data['timestamp'], utc=True)
+            tz = str(data['tz'])
+            if tz != 'UTC':
+                index = index.tz_convert(tz)
+            return pd.DataFrame({col: data[col] for col in COLUMNS}, index=index)
+
+    def save_partition(self, symbol, interval, day, df):
+        """Write one day atomically so a crash never leaves a torn file"""
+        directory = self.partition_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{day}.npz")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                timestamp=df.index.tz_convert('UTC').as_unit('ns').asi8,
+                tz=np.array(str(df.index.tz)),
+                **{col: df[col].to_numpy(dtype=float) for col in COLUMNS}
+            )
+        os.replace(tmp_path, path)
+
+    def last_timestamp(self, symbol, interval):
+        """Timestamp of the newest cached bar, or None"""
+        days = self.partition_days(symbol, interval)
+        if not days:
+            return None
+        return self.load_partition(symbol, interval, days[-1]).index[-1]
+
+    def write(self, symbol, interval, df):
+        """Merge bars into their day partitions; newer rows replace cached ones"""
+        if df.empty:
+            return
+        df = df[COLUMNS]
+        if df.index.tz is None:
+            df = df.tz_localize('UTC')
+        days = df.index.tz_convert('UTC').strftime('%Y-%m-%d')
+        for day, rows in df.groupby(days):
+            cached = self.partition_days(symbol, interval)
+            if day in cached:
+                existing = self.load_partition(symbol, interval, day)
+                rows = pd.concat([existing, rows.tz_convert(existing.index.tz)])
+                rows = rows[~rows.index.duplicated(keep='last')].sort_index()
+            self.save_partition(symbol, interval, day, rows)
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Load cached bars in [start, end)"""
+        days = self.partition_days(symbol, interval)
+        if start is not None:
+            start = self.to_utc(start)
+            days = [d for d in days if d >= start.strftime('%Y-%m-%d')]
+        if end is not None:
+            end = self.to_utc(end)
+            days = [d for d in days if d <= end.strftime('%Y-%m-%d')]
+        if not days:
+            return pd.DataFrame(columns=COLUMNS)
+
+        df = pd.concat([self.load_partition(symbol, interval, d) for d in days])
+        if start is not None:
+            df = df[df.index >= start]
+        if end is not None:
+            df = df[df.index < end]
+        return df
+
+    @staticmethod
+    def to_utc(timestamp):
+        """Timezone-aware UTC timestamp; naive values are taken as UTC"""
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None:
+            return timestamp.tz_localize('UTC')
+        return timestamp.tz_convert('UTC')
+
+
+class CachedDataSource:
+    """Read bars from a BarStore, fetching only the missing tail from the source
+
+    If the fetch fails, the cached bars are served instead, so a Yahoo outage
+    delays new bars rather than stopping the cycle.
+    """
+
+    def __init__(self, source=None, store=None):
+        self.source = source if source is not None else YahooSource()
+        self.store = store if store is not None else BarStore()
+
+    def get_bars(self, symbol, interval, start, end):
+        """Bars in [start, end), fetching only what the cache does not have"""
+        start = BarStore.to_utc(start)
+        end = BarStore.to_utc(end)
+        last = self.store.last_timestamp(symbol, interval)
+        if last is None or last < start:
+            fetch_start = start
+        else:
+            # Refetch from the last cached bar: it may have been the still-forming candle
+            fetch_start = BarStore.to_utc(last)
+        if fetch_start < end:
+            try:
+                fresh = self.source.fetch(symbol, interval, fetch_start.to_pydatetime(), end.to_pydatetime())
+            except Exception as e:
+                cached = self.store.read(symbol, interval, start, end)
+                if cached.empty:
+                    raise
+                METRICS.count('fetch_fallbacks')
+                print(f"Fetching {symbol} failed ({str(e)}), using cached bars up to {cached.index[-1]}")
+                return cached
+            self.store.write(symbol, interval, fresh)
+        return self.store.read(symbol, interval, start, end)
+
+
+class ResampledDataSource:
+    """Serve any interval from one cached base-resolution feed
+
+    Only base bars are downloaded and stored. Coarser bars are aggregated from
+    them and kept in memory; later calls only re-aggregate from the newest
+    (possibly still forming) coarse bar onward.
+    """
+
+    def __init__(self, source=None, base_interval='1m'):
+        self.source = source if source is not None else CachedDataSource()
+        self.base_interval = base_interval
+        self.rolled = {}
+
+    def get_bars(self, symbol, interval, start, end):
+        if interval == self.base_interval:
+            return self.source.get_bars(symbol, interval, start, end)
+        start = BarStore.to_utc(start)
+        end = BarStore.to_utc(end)
+        key = (symbol, interval)
+        rolled = self.rolled.get(key)
+
+        width = pd.Timedelta(seconds=INTERVAL_SECONDS[interval])
+        if rolled is None or rolled.empty or rolled.index[0] > start + width:
+            base = self.source.get_bars(symbol, self.base_interval, start, end)
+            bars = resample_bars(base, interval, bucket_origin(symbol))
+        else:
+            # Roll up only the base bars of the newest coarse bar and after
+            last = rolled.index[-1]
+            base = self.source.get_bars(symbol, self.base_interval, last, end)
+            if base.empty:
+                bars = rolled
+            else:
+                bars = pd.concat([rolled[rolled.index < last], resample_bars(base, interval, bucket_origin(symbol))])
+
+        # The bar containing start is incomplete, so it is dropped
+        bars = bars[(bars.index >= start) & (bars.index < end)]
+        self.rolled[key] = bars
+        return bars
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def indicator_columns(config):
+    """Indicator column names produced by calculate_indicators for config"""
+    columns = [
+        f"ema_{config['ema_fast']}", f"ema_{config['ema_slow']}", 'sma_20',
+        'rsi', 'macd', 'macd_signal', 'atr',
+        'bb_upper', 'bb_middle', 'bb_lower', 'volume_sma', 'volume_ratio'
+    ]
+    if config.get('trend_timeframe'):
+        columns.append('ema_trend')
+    return columns
+
+
+class BarWindow:
+    """Fixed-capacity rolling window of bars and indicators, one preallocated array per column
+
+    Rows live in a buffer a quarter larger than the capacity so the window is
+    always a contiguous slice; when the buffer end is reached the newest rows are
+    moved to the front in place, so appends never allocate.
+    """
+
+    def __init__(self, columns, capacity, dtype=np.float32):
+        # OHLCV always come first, followed by the derived columns
+        self.columns = BAR_COLUMNS + list(columns)
+        self.rows = {name: i for i, name in enumerate(self.columns)}
+        self.capacity = capacity
+        size = capacity + max(capacity // 4, 1)
+        self.data = np.full((len(self.columns), size), np.nan, dtype=dtype)
+        self.timestamps = np.zeros(size, dtype='int64')
+        self.tz = None
+        self.start = 0
+        self.end = 0
+
+    @classmethod
+    def for_config(cls, config, capacity, dtype=np.float32):
+        """Window holding OHLCV, the config's indicator columns and the signal"""
+        return cls(indicator_columns(config) + ['signal'], capacity, dtype)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, name):
+        """Zero-copy Series view of one column"""
+        return pd.Series(self.column(name), name=name, copy=False)
+
+    def column(self, name):
+        return self.data[self.rows[name], self.start:self.end]
+
+    @property
+    def index(self):
+        return self._index(self.start)
+
+    def _index(self, start):
+        index = pd.DatetimeIndex(self.timestamps[start:self.end].view('datetime64[ns]'))
+        return index if self.tz is None else index.tz_localize('UTC').tz_convert(self.tz)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.timestamps.nbytes
+
+    def clear(self):
+        self.start = 0
+        self.end = 0
+
+    def _make_room(self, n):
+        """Ensure n more rows fit after end, dropping the oldest rows beyond capacity"""
+        if self.end + n <= len(self.timestamps):
+            return
+        keep = min(len(self), self.capacity - n)
+        first = self.end - keep
+        self.data[:, :keep] = self.data[:, first:self.end]
+        self.timestamps[:keep] = self.timestamps[first:self.end]
+        self.start = 0
+        self.end = keep
+
+    def merge(self, df):
+        """Write bars of df at or after the last stored bar into the window
+
+        Returns the window position of the first written row. When df does not
+        overlap the window it is reloaded from scratch and 0 is returned.
+        """
+        self.tz = df.index.tz
+        stamps = df.index.as_unit('ns').asi8
+
+        if len(self):
+            # The last stored bar may have still been forming, so it is rewritten too
+            position = np.searchsorted(stamps, self.timestamps[self.end - 1])
+            if position < len(stamps) and stamps[position] == self.timestamps[self.end - 1]:
+                stamps = stamps[position:]
+                df = df.iloc[position:]
+                self.end -= 1
+            else:
+                self.clear()
+
+        n = min(len(stamps), self.capacity)
+        stamps = stamps[len(stamps) - n:]
+        self._make_room(n)
+        first = len(self)
+        rows = slice(self.end, self.end + n)
+        self.timestamps[rows] = stamps
+        for name in BAR_COLUMNS:
+            self.data[self.rows[name], rows] = df[name].to_numpy()[len(df) - n:]
+        self.data[len(BAR_COLUMNS):, rows] = np.nan
+        self.end += n
+        dropped = self.end - self.capacity - self.start
+        if dropped > 0:
+            self.start += dropped
+            first = max(first - dropped, 0)
+        return first
+
+    def set(self, position, values):
+        """Write a dict of column values into one window row"""
+        column = self.start + position
+        for name, value in values.items():
+            self.data[self.rows[name], column] = value
+
+    def frame(self, n=None):
+        """float64 DataFrame of the last n rows, for code that needs pandas"""
+        start = self.start if n is None else max(self.start, self.end - n)
+        return pd.DataFrame(self.data[:, start:self.end].T.astype(float), index=self._index(start),
+                            columns=self.columns)
@@ -0,0 +1,446 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from bar_store import BarStore, CachedDataSource, FrameSource
+from concurrent.futures import ThreadPoolExecutor
+from data_client import DataClient, FetchError, YahooChartSource
+from fill_simulator import BUY, LIMIT, SELL, STOP, FeeModel, FillSimulator, LatencyModel, SlippageModel
+from indicator_engine import IncrementalIndicators
+from synthetic_data import ChartServer, generate_ohlcv
+from trading_bot import AlgoTrader
+from aggressive_config import CONFIG as AGGRESSIVE
+from conservative_config import CONFIG as CONSERVATIVE
+
+PROFILES = {'aggressive': AGGRESSIVE, 'conservative': CONSERVATIVE}
+
+# Bars in the 30-day window get_historical_data asks for
+WINDOW_DAYS = 30
+WINDOW_BARS = {'1m': WINDOW_DAYS * 24 * 60, '1h': WINDOW_DAYS * 24}
+
+# Seconds a fresh process may take to import trading_bot and run one cycle on cached data.
+# The import budget is on top of a bare `import numpy, pandas` timed the same way, so it
+# tracks this repo's own import cost rather than the speed of the machine.
+STARTUP_BUDGET = {'startup_import': 0.15, 'startup_cycle': 0.2}
+
+# Modules a resumed cycle on cached data must not import
+DEFERRED_MODULES = ['ta', 'yfinance', 'requests', 'http.server', 'sortedcontainers']
+
+# Runs in a fresh interpreter: time the imports, then one cycle with no new bars to fetch
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import contextlib, io, json, sys
+sys.path.insert(0, sys.argv[1])
+from trading_bot import AlgoTrader
+from bar_store import COLUMNS, BarStore, CachedDataSource, FrameSource
+from {module} import CONFIG
+imported = time.perf_counter()
+import pandas as pd
+empty = pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], tz='UTC'), dtype=float)
+with contextlib.redirect_stdout(io.StringIO()):
+    AlgoTrader(CONFIG, data_source=CachedDataSource(FrameSource(empty), BarStore())).run(continuous_mode=False)
+done = time.perf_counter()
+print(json.dumps({{'startup_import': imported - start, 'startup_cycle': done - imported,
+                  'modules': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+# The same fresh interpreter importing only the libraries every path needs
+BASELINE_SCRIPT = """
+import time
+start = time.perf_counter()
+import numpy, pandas
+print(time.perf_counter() - start)
+"""
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Run inside a temporary directory so account and journal files stay out of the repo"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(cwd)
+
+
+def measure(fn, repeat, memory):
+    """Best wall time over repeat runs, plus peak traced memory of one extra run"""
+    best = float('inf')
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        peak = 0
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return best, peak
+
+
+def result(name, profile, items, seconds, peak, unit='bars'):
+    return {
+        'benchmark': name,
+        'profile': profile,
+        'items': items,
+        'unit': unit,
+        'seconds': seconds,
+        'throughput': items / seconds if seconds else float('inf'),
+        'peak_mb': peak / 1e6
+    }
+
+
+def bench_bars(profile, config, n_bars, repeat, memory):
+    """Indicator, signal and backtest throughput on n_bars of synthetic data"""
+    df = generate_ohlcv(n_bars, config['timeframe'], volatility=0.002, jump_intensity=0.001,
+                        jump_std=0.01, seed=n_bars)
+    results = []
+    with scratch_dir():
+        trader = Backtester(config)
+
+        seconds, peak = measure(lambda: trader.calculate_indicators(df), repeat, memory)
+        results.append(result('calculate_indicators', profile, n_bars, seconds, peak))
+
+        indicators = trader.calculate_indicators(df)
+        seconds, peak = measure(lambda: trader.generate_signals(indicators.copy()), repeat, memory)
+        results.append(result('generate_signals', profile, n_bars, seconds, peak))
+
+        seconds, peak = measure(lambda: trader.backtest(df), repeat, memory)
+        results.append(result('backtest', profile, n_bars, seconds, peak))
+
+        # Pure-Python per-bar updates: keep the sample bounded
+        sample = df.iloc[:min(n_bars, 200_000)]
+        seconds, peak = measure(lambda: IncrementalIndicators(config).apply(sample), 1, memory)
+        results.append(result('incremental_indicators', profile, len(sample), seconds, peak))
+    return results
+
+
+def bench_execution(profile, config, n_trades, repeat, memory):
+    """BUY/SELL round trips through execute_trade, including journal and snapshot writes"""
+    def round_trips():
+        trader = AlgoTrader(config)
+        price = 5_000_000.0
+        start = pd.Timestamp('2024-01-01', tz='UTC')
+        for i in range(n_trades // 2):
+            timestamp = start + pd.Timedelta(hours=i)
+            trader.execute_trade(1, price, timestamp)
+            trader.execute_trade(-1, price * 1.001, timestamp)
+
+    with scratch_dir():
+        seconds, peak = measure(round_trips, repeat, memory)
+    return [result('execute_trade', profile, n_trades, seconds, peak, unit='trades')]
+
+
+def bench_fills(n_bars, repeat, memory, orders_per_bar=4):
+    """Order events per second through the fill simulator: submits plus fills on 1m bars"""
+    df = generate_ohlcv(n_bars, '1m', volatility=0.002, seed=4)
+    opens, highs, lows, closes, volumes = (df[column].tolist() for column in ('Open', 'High', 'Low', 'Close', 'Volume'))
+    events = [0]
+
+    def replay():
+        rng = np.random.default_rng(n_bars)
+        kinds = rng.random((n_bars, orders_per_bar)).tolist()
+        sides = np.where(rng.random((n_bars, orders_per_bar)) < 0.5, BUY, SELL).tolist()
+        offsets = (rng.random((n_bars, orders_per_bar)) * 0.003).tolist()
+        simulator = FillSimulator(FeeModel(2, 5), SlippageModel(1, 0.1), LatencyModel(0.05, 0.1, seed=1),
+                                  participation=0.25)
+        count = 0
+        for i in range(n_bars):
+            timestamp = i * 60.0
+            price = closes[i]
+            for kind, side, offset in zip(kinds[i], sides[i], offsets[i]):
+                # A mix of market orders, passive limits and stops around the last close
+                if kind < 0.2:
+                    simulator.submit('BTC-INR', side, 0.01, timestamp=timestamp)
+                elif kind < 0.8:
+                    simulator.submit('BTC-INR', side, 0.01, LIMIT, price=price * (1 - side * offset), timestamp=timestamp)
+                else:
+                    simulator.submit('BTC-INR', side, 0.01, STOP, stop_price=price * (1 + side * offset), timestamp=timestamp)
+            count += orders_per_bar + len(simulator.on_bar('BTC-INR', timestamp + 60, opens[i], highs[i],
+                                                           lows[i], closes[i], volumes[i]))
+        events[0] = count
+
+    seconds, peak = measure(replay, repeat, memory)
+    return [result('fill_simulator', 'any', events[0], seconds, peak, unit='events')]
+
+
+def bench_startup(profile, repeat):
+    """Cold start of a scheduled run: import time and one resumed cycle in a fresh process"""
+    config = PROFILES[profile]
+    n_bars = WINDOW_BARS.get(config['timeframe'], 720) + 240
+    end = pd.Timestamp.now(tz='UTC').floor('h')
+    df = generate_ohlcv(n_bars, config['timeframe'], volatility=0.002, seed=5)
+    df.index = pd.date_range(end=end, periods=n_bars, freq=df.index.freq, tz='UTC')
+
+    script = STARTUP_SCRIPT.format(module=f"{profile}_config", deferred=DEFERRED_MODULES)
+    repo = os.path.dirname(os.path.abspath(__file__))
+    best = {}
+    with scratch_dir():
+        # A previous run leaves the bar cache, account and indicator checkpoint behind
+        with contextlib.redirect_stdout(io.StringIO()):
+            AlgoTrader(config, data_source=CachedDataSource(FrameSource(df))).run(continuous_mode=False)
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', script, repo], capture_output=True, text=True, check=True)
+            timings = json.loads(output.stdout.strip().splitlines()[-1])
+            for name in STARTUP_BUDGET:
+                best[name] = min(best.get(name, float('inf')), timings[name])
+            output = subprocess.run([sys.executable, '-c', BASELINE_SCRIPT], capture_output=True, text=True, check=True)
+            best['baseline'] = min(best.get('baseline', float('inf')), float(output.stdout))
+
+    results = []
+    for name, budget in STARTUP_BUDGET.items():
+        record = result(name, profile, 1, best[name], 0, unit='runs')
+        record['budget'] = budget
+        record['baseline'] = best['baseline'] if name == 'startup_import' else 0.0
+        record['deferred_imported'] = timings['modules']
+        results.append(record)
+    return results
+
+
+def bench_fetch(n_symbols, n_requests, failure_rate=0.1, max_rate=50):
+    """Concurrent multi-symbol downloads from a local chart server that fails and throttles
+
+    Compares a bare client (no retries or rate limit) with the default resilient
+    one; items are requests, and error_rate / p50 / p99 latency are recorded.
+    """
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    frames = {}
+    for i, symbol in enumerate(symbols):
+        df = generate_ohlcv(1440, '1m', seed=i)
+        df.index = pd.date_range(end=end, periods=len(df), freq='min', tz='UTC')
+        frames[symbol] = df
+
+    server = ChartServer(frames, failure_rate=failure_rate, max_rate=max_rate, latency=0.02, seed=0)
+    url = server.start()
+    results = []
+    try:
+        for name, client in [('fetch_bare', DataClient(max_retries=0, rate_limit=None)),
+                             ('fetch_resilient', DataClient(rate_limit=max_rate * 0.8, burst=5, backoff=0.05, seed=0))]:
+            # Start each client with an empty throttling window
+            time.sleep(1.0)
+            source = YahooChartSource(client, url)
+            latencies = []
+
+            def request(i):
+                start = time.perf_counter()
+                try:
+                    source.fetch(symbols[i % n_symbols], '1m', end - pd.Timedelta(hours=2), end)
+                    failed = 0
+                except FetchError:
+                    failed = 1
+                latencies.append(time.perf_counter() - start)
+                return failed
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                errors = sum(pool.map(request, range(n_requests)))
+            record = result(name, 'any', n_requests, time.perf_counter() - start, 0, unit='requests')
+            record['error_rate'] = errors / n_requests
+            record['p50'], record['p99'] = np.percentile(latencies, [50, 99])
+            results.append(record)
+    finally:
+        server.stop()
+    return results
+
+
+def check_startup(results, margin=1.0):
+    """Print startup budget violations; returns True when every run is within budget
+
+    Import time is compared net of the numpy/pandas baseline. margin scales every
+    budget, for slower or noisier machines such as CI runners.
+    """
+    ok = True
+    for r in results:
+        if 'budget' not in r:
+            continue
+        seconds = r['seconds'] - r.get('baseline', 0.0)
+        if seconds > r['budget'] * margin:
+            print(f"{r['benchmark']} ({r['profile']}): {seconds:.3f}s over baseline exceeds the "
+                  f"{r['budget'] * margin:.3f}s budget")
+            ok = False
+        if r['deferred_imported']:
+            print(f"{r['benchmark']} ({r['profile']}): imported {', '.join(r['deferred_imported'])}")
+            ok = False
+    return ok
+
+
+def bench_cycle(profile, config, repeat, memory):
+    """Full run_once cycles on cached data: cold start, then warm delta cycles"""
+    n_bars = WINDOW_BARS.get(config['timeframe'], 720)
+    end = pd.Timestamp.now(tz='UTC').floor('h')
+    df = generate_ohlcv(n_bars, config['timeframe'], volatility=0.002, seed=1)
+    df.index = pd.date_range(end=end, periods=n_bars, freq=df.index.freq)
+
+    results = []
+    with scratch_dir():
+        def cold():
+            for name in os.listdir('.'):
+                if os.path.isfile(name):
+                    os.remove(name)
+            trader = AlgoTrader(config, data_source=CachedDataSource(FrameSource(df), BarStore(f"cache_{time.time_ns()}")))
+            trader.run(continuous_mode=False)
+            return trader
+
+        seconds, peak = measure(cold, repeat, memory)
+        results.append(result('cycle_cold', profile, n_bars, seconds, peak))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            trader = cold()
+        seconds, peak = measure(trader.run_once, repeat, memory)
+        results.append(result('cycle_warm', profile, n_bars, seconds, peak))
+    return results
+
+
+def bench_memory(profile, config, repeat, memory):
+    """Resident bytes per symbol-day and warm-cycle cost: pandas frame vs compact window"""
+    n_bars = WINDOW_BARS.get(config['timeframe'], 720)
+    df = generate_ohlcv(n_bars + 1, config['timeframe'], volatility=0.002, seed=2)
+    previous, latest = df.iloc[:-1], df.iloc[1:]
+
+    results = []
+    with scratch_dir():
+        with contextlib.redirect_stdout(io.StringIO()):
+            frame_trader = AlgoTrader(config)
+            frame = frame_trader.generate_signals(frame_trader.calculate_indicators(previous))
+            window_trader = AlgoTrader(dict(config, compact_window=n_bars))
+            window = window_trader.generate_signals(window_trader.calculate_indicators(previous))
+
+        # A warm cycle: the fetched frame has moved on by one bar
+        def frame_cycle():
+            frame_trader.generate_signals(frame_trader.calculate_indicators(latest))
+
+        def window_cycle():
+            window_trader.generate_signals(window_trader.calculate_indicators(latest))
+
+        for name, resident, cycle in [('memory_frame', frame.memory_usage(deep=True).sum(), frame_cycle),
+                                      ('memory_window', window.nbytes, window_cycle)]:
+            seconds, peak = measure(cycle, repeat, memory)
+            record = result(name, profile, n_bars, seconds, peak)
+            record['bytes_per_symbol_day'] = resident / WINDOW_DAYS
+            results.append(record)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results):
+    print(f"\n{'benchmark':<24}{'profile':<14}{'items':>10}{'seconds':>11}{'throughput':>16}{'peak MB':>10}")
+    for r in results:
+        print(f"{r['benchmark']:<24}{r['profile']:<14}{r['items']:>10,}{r['seconds']:>11.4f}"
+              f"{r['throughput']:>12,.0f} {r['unit'][:3]}/s{r['peak_mb']:>10.1f}")
+
+    fetches = [r for r in results if 'error_rate' in r]
+    if fetches:
+        print(f"\n{'fetch':<24}{'error rate':>12}{'p50 s':>10}{'p99 s':>10}")
+    for r in fetches:
+        print(f"{r['benchmark']:<24}{r['error_rate']:>12.1%}{r['p50']:>10.3f}{r['p99']:>10.3f}")
+
+    resident = [r for r in results if 'bytes_per_symbol_day' in r]
+    if resident:
+        print("\nResident bytes per symbol-day")
+    for r in resident:
+        print(f"{r['benchmark']:<24}{r['profile']:<14}{r['bytes_per_symbol_day']:>12,.0f}")
+
+
+def compare(path, run):
+    """Print throughput ratios against the most recent run from a different commit"""
+    previous = None
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['commit'] != run['commit']:
+                    previous = record
+    if previous is None:
+        print("\nNo earlier run from a different commit to compare against")
+        return
+
+    baseline = {(r['benchmark'], r['profile'], r['items']): r for r in previous['results']}
+    print(f"\n=== {run['commit']} vs {previous['commit']} ===")
+    for r in run['results']:
+        base = baseline.get((r['benchmark'], r['profile'], r['items']))
+        if base:
+            print(f"{r['benchmark']:<24}{r['profile']:<14}{r['items']:>10,}  "
+                  f"{r['throughput'] / base['throughput']:.2f}x throughput, "
+                  f"{r['peak_mb'] - base['peak_mb']:+.1f} MB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the trading pipeline on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--trades', type=int, default=200)
+    parser.add_argument('--fill-bars', type=int, default=50_000, help='bars replayed through the fill simulator')
+    parser.add_argument('--fetch-symbols', type=int, default=40, help='symbols served by the local chart server')
+    parser.add_argument('--fetch-requests', type=int, default=400)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', default='benchmark_results.jsonl')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--startup', action='store_true',
+                        help='only check cold-start time against STARTUP_BUDGET; exits 1 when over budget')
+    parser.add_argument('--margin', type=float, default=1.0, help='multiply the startup budgets, e.g. 2 on CI')
+    args = parser.parse_args()
+    memory = not args.no_memory
+
+    if args.startup:
+        results = [r for profile in args.profiles for r in bench_startup(profile, args.repeat)]
+        print_results(results)
+        print(f"numpy/pandas baseline import: {results[0]['baseline']:.3f}s")
+        sys.exit(0 if check_startup(results, args.margin) else 1)
+
+    results = []
+    for profile in args.profiles:
+        config = PROFILES[profile]
+        for n_bars in args.sizes:
+            results.extend(bench_bars(profile, config, n_bars, args.repeat, memory))
+        results.extend(bench_execution(profile, config, args.trades, args.repeat, memory))
+        results.extend(bench_cycle(profile, config, args.repeat, memory))
+        results.extend(bench_memory(profile, config, args.repeat, memory))
+        results.extend(bench_startup(profile, args.repeat))
+    results.extend(bench_fills(args.fill_bars, args.repeat, memory))
+    results.extend(bench_fetch(args.fetch_symbols, args.fetch_requests))
+    print_results(results)
+    check_startup(results, args.margin)
+
+    run = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results
+    }
+    if args.compare:
+        compare(args.output, run)
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+if __name__ == '__main__':
+    main()
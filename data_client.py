@@ -0,0 +1,296 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS, MAX_REQUEST_DAYS
+from metrics import METRICS
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+
+# Responses worth retrying; anything else (e.g. 404 for an unknown symbol) fails at once
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Yahoo rejects the default python-requests user agent
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+
+class FetchError(Exception):
+    """A request failed for good, after any retries"""
+
+
+class CircuitOpenError(FetchError):
+    """The host failed repeatedly; requests are refused until its cooldown ends"""
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]"""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimiter:
+    """Token bucket allowing rate requests per second in bursts of up to burst"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures; after cooldown one trial request is let through
+
+    A successful trial closes the circuit again, a failed one restarts the cooldown.
+    A trial that reports no outcome within trial_timeout (default: the cooldown)
+    is given up on and another one is let through.
+    """
+
+    def __init__(self, threshold=6, cooldown=60.0, trial_timeout=None):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.trial_timeout = cooldown if trial_timeout is None else trial_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if ((self.state == 'open' and now - self.opened_at >= self.cooldown) or
+                    (self.state == 'half_open' and now - self.trial_at >= self.trial_timeout)):
+                self.state = 'half_open'
+                self.trial_at = now
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class DataClient:
+    """Shared HTTP client for market data
+
+    One pooled session serves every thread. Each host gets its own rate limiter
+    and circuit breaker. Failed requests are retried with jittered exponential
+    backoff, and concurrent callers asking for the same key share one request.
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0, timeout=10.0, rate_limit=10.0,
+                 burst=None, failure_threshold=6, cooldown=60.0, pool_size=32, seed=None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.pool_size = pool_size
+        self.random = random.Random(seed)
+        self.session = None
+        self.hosts = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_retries=config.get('fetch_retries', 3),
+            backoff=config.get('fetch_backoff', 0.5),
+            max_backoff=config.get('fetch_max_backoff', 30.0),
+            timeout=config.get('fetch_timeout', 10.0),
+            rate_limit=config.get('fetch_rate_limit', 10.0),
+            burst=config.get('fetch_burst'),
+            failure_threshold=config.get('circuit_threshold', 6),
+            cooldown=config.get('circuit_cooldown', 60.0)
+        )
+
+    def get_session(self):
+        """The pooled session, created on first use so cached runs never import requests"""
+        with self.lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = USER_AGENT
+                self.session = session
+            return self.session
+
+    def host(self, url):
+        """(rate limiter or None, circuit breaker) for the host of url"""
+        name = urlsplit(url).netloc
+        with self.lock:
+            if name not in self.hosts:
+                limiter = RateLimiter(self.rate_limit, self.burst) if self.rate_limit else None
+                self.hosts[name] = (limiter, CircuitBreaker(self.failure_threshold, self.cooldown))
+            return self.hosts[name]
+
+    def get_json(self, url, params=None):
+        """GET url and decode JSON, retrying transient failures"""
+        import requests
+        session = self.get_session()
+        limiter, breaker = self.host(url)
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                METRICS.count('fetch_circuit_open')
+                raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc} after repeated failures")
+            if limiter is not None:
+                limiter.acquire()
+
+            retry_after = 0.0
+            try:
+                with METRICS.stage('http'):
+                    response = session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+            else:
+                if response.status_code < 400:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        # Truncated or non-JSON body (e.g. an HTML error page): transient
+                        error = FetchError(f"Invalid JSON from {url}: {e}")
+                    else:
+                        breaker.success()
+                        return data
+                elif response.status_code not in RETRY_STATUS:
+                    # The host answered, so the circuit closes even though this request failed
+                    breaker.success()
+                    raise FetchError(f"HTTP {response.status_code} for {url}")
+                else:
+                    error = FetchError(f"HTTP {response.status_code} for {url}")
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', 0))
+                    except ValueError:
+                        pass
+
+            breaker.failure()
+            if attempt < self.max_retries:
+                METRICS.count('fetch_retries')
+                time.sleep(max(retry_after, backoff_delay(attempt, self.backoff, self.max_backoff, self.random)))
+        METRICS.count('fetch_errors')
+        raise FetchError(f"Giving up after {self.max_retries + 1} attempts: {error}")
+
+    def coalesce(self, key, fetch):
+        """Run fetch once for concurrent callers with the same key; the others wait for its result"""
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            METRICS.count('fetch_coalesced')
+            return future.result()
+        try:
+            result = fetch()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+
+class YahooChartSource:
+    """Fetch OHLCV bars from Yahoo's chart API through a DataClient
+
+    base_url can point at a local stand-in (see synthetic_data.ChartServer).
+    """
+
+    def __init__(self, client=None, base_url=YAHOO_CHART_URL):
+        self.client = client if client is not None else DataClient()
+        self.base_url = base_url
+
+    def fetch(self, symbol, interval, start, end):
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        # Overlapping requests for the same series share one download
+        df, (fetched_start, fetched_end) = self.client.coalesce(
+            (self.base_url, symbol, interval),
+            lambda: (self.download(symbol, interval, start, end), (start, end))
+        )
+        if fetched_start > start or fetched_end < end:
+            # Joined a download that did not cover the range this request needs
+            df = self.download(symbol, interval, start, end)
+        return df[(df.index >= start) & (df.index < end)]
+
+    def download(self, symbol, interval, start, end):
+        # Long 1m ranges have to be requested a few days at a time
+        step = pd.Timedelta(days=MAX_REQUEST_DAYS[interval]) if interval in MAX_REQUEST_DAYS else end - start
+        frames = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(end, chunk_start + step)
+            df = self.parse(self.client.get_json(self.base_url + symbol, {
+                'period1': int(chunk_start.timestamp()),
+                'period2': int(chunk_end.timestamp()),
+                'interval': interval,
+                'includePrePost': 'false'
+            }), interval)
+            if not df.empty:
+                frames.append(df)
+            chunk_start = chunk_end
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], tz='UTC'), dtype=float)
+        df = pd.concat(frames)
+        return df[~df.index.duplicated(keep='last')]
+
+    @staticmethod
+    def parse(data, interval):
+        """Chart API JSON to an OHLCV frame in the exchange timezone"""
+        chart = data.get('chart') or {}
+        if chart.get('error'):
+            raise FetchError(f"Yahoo error: {chart['error']}")
+        result = (chart.get('result') or [None])[0]
+        if not result or not result.get('timestamp'):
+            return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], tz='UTC'), dtype=float)
+
+        quote = result['indicators']['quote'][0]
+        index = pd.to_datetime(np.array(result['timestamp'], dtype='int64'), unit='s', utc=True)
+        index = index.tz_convert(result.get('meta', {}).get('exchangeTimezoneName') or 'UTC')
+        if interval == '1d':
+            index = index.normalize()
+        df = pd.DataFrame({column: np.array(quote[column.lower()], dtype=float) for column in COLUMNS},
+                          index=index)
+        # Minutes without trades come back as nulls
+        df = df.dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
+        df['Volume'] = df['Volume'].fillna(0.0)
+        return df
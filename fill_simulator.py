@@ -0,0 +1,309 @@
+import heapq
+import itertools
+import math
+import random
+
+BUY = 1
+SELL = -1
+
+MARKET = 'market'
+LIMIT = 'limit'
+STOP = 'stop'
+
+
+class Order:
+    """One simulated order; price is the limit price, stop_price the trigger of a stop order"""
+
+    __slots__ = ('id', 'symbol', 'side', 'type', 'size', 'price', 'stop_price',
+                 'filled', 'submitted_at', 'active_at', 'status')
+
+    def __init__(self, order_id, symbol, side, order_type, size, price=None, stop_price=None,
+                 submitted_at=0.0, active_at=0.0):
+        self.id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.type = order_type
+        self.size = size
+        self.price = price
+        self.stop_price = stop_price
+        self.filled = 0.0
+        self.submitted_at = submitted_at
+        self.active_at = active_at
+        self.status = 'pending'
+
+    @property
+    def remaining(self):
+        return self.size - self.filled
+
+    def __repr__(self):
+        return (f"Order({self.id}, {self.symbol}, {'BUY' if self.side == BUY else 'SELL'} {self.type} "
+                f"{self.filled}/{self.size} @ {self.price or self.stop_price}, {self.status})")
+
+
+class FeeModel:
+    """Proportional maker/taker fees in basis points of notional, with an optional minimum"""
+
+    def __init__(self, maker_bps=0.0, taker_bps=0.0, minimum=0.0):
+        self.maker_rate = maker_bps / 10_000
+        self.taker_rate = taker_bps / 10_000
+        self.minimum = minimum
+
+    def fee(self, price, size, maker=False):
+        notional = price * size
+        if not notional:
+            return 0.0
+        return max(notional * (self.maker_rate if maker else self.taker_rate), self.minimum)
+
+
+class SlippageModel:
+    """Adverse price move for orders that take liquidity
+
+    A fixed spread cost in basis points plus square-root market impact:
+    impact * sqrt(size / volume), when the traded volume is known.
+    """
+
+    def __init__(self, bps=0.0, impact=0.0):
+        self.rate = bps / 10_000
+        self.impact = impact
+
+    def price(self, side, price, size, volume=None):
+        rate = self.rate
+        if self.impact and volume is not None and volume > 0:
+            rate += self.impact * math.sqrt(abs(size) / volume)
+        return price * (1 + side * rate)
+
+
+class LatencyModel:
+    """Delay between submitting an order and the exchange seeing it, in seconds"""
+
+    def __init__(self, seconds=0.0, jitter=0.0, seed=None):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def delay(self):
+        if self.jitter:
+            return self.seconds + self.random.uniform(0.0, self.jitter)
+        return self.seconds
+
+
+class OrderBook:
+    """Resting orders for one symbol in price-time priority, bounded to max_orders
+
+    Entries are (sort key, order id, order) tuples in SortedLists, so the best
+    price is always at index 0 and matching pops from the front.
+    """
+
+    def __init__(self, max_orders=10_000):
+        # Only simulations that rest orders need the sorted containers
+        from sortedcontainers import SortedList
+        self.max_orders = max_orders
+        self.bids = SortedList()        # (-price, id, order): highest bid first
+        self.asks = SortedList()        # (price, id, order): lowest ask first
+        self.buy_stops = SortedList()   # (stop, id, order): triggers when price rises to stop
+        self.sell_stops = SortedList()  # (-stop, id, order): triggers when price falls to stop
+        self.entries = {}
+        self.pending = []               # heap of (active_at, id, order) still in flight
+
+    def __len__(self):
+        return len(self.entries)
+
+    def side_list(self, order):
+        if order.type == STOP:
+            return self.buy_stops if order.side == BUY else self.sell_stops
+        return self.bids if order.side == BUY else self.asks
+
+    @staticmethod
+    def sort_key(order):
+        if order.type == STOP:
+            return order.stop_price if order.side == BUY else -order.stop_price
+        return -order.price if order.side == BUY else order.price
+
+    def add(self, order):
+        """Rest an order in the book; returns False when the book is full"""
+        if len(self.entries) >= self.max_orders:
+            return False
+        entry = (self.sort_key(order), order.id, order)
+        self.side_list(order).add(entry)
+        self.entries[order.id] = entry
+        if not order.filled:
+            order.status = 'open'
+        return True
+
+    def remove(self, order):
+        entry = self.entries.pop(order.id, None)
+        if entry is not None:
+            self.side_list(order).remove(entry)
+        return entry is not None
+
+    def best_bid(self):
+        return -self.bids[0][0] if self.bids else None
+
+    def best_ask(self):
+        return self.asks[0][0] if self.asks else None
+
+
+class FillSimulator:
+    """Simulated exchange: market, limit and stop orders matched against bars or ticks
+
+    Market orders and triggered stops take liquidity at the next price seen after
+    their latency, plus slippage and taker fees. Resting limit orders fill at their
+    limit (or better, if the market gaps through it) and pay maker fees. Each bar
+    can fill at most participation * volume, so large orders fill partially.
+    """
+
+    def __init__(self, fees=None, slippage=None, latency=None, participation=1.0, max_orders=10_000):
+        self.fees = fees or FeeModel()
+        self.slippage = slippage or SlippageModel()
+        self.latency = latency or LatencyModel()
+        self.participation = participation
+        self.max_orders = max_orders
+        self.books = {}
+        self.ids = itertools.count(1)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from the flat fee/slippage/latency config keys; all default to free and instant"""
+        return cls(
+            fees=FeeModel(config.get('maker_fee_bps', config.get('fee_bps', 0.0)),
+                          config.get('taker_fee_bps', config.get('fee_bps', 0.0)),
+                          config.get('min_fee', 0.0)),
+            slippage=SlippageModel(config.get('slippage_bps', 0.0), config.get('market_impact', 0.0)),
+            latency=LatencyModel(config.get('latency_ms', 0.0) / 1000, config.get('latency_jitter_ms', 0.0) / 1000),
+            participation=config.get('participation', 1.0),
+            max_orders=config.get('max_open_orders', 10_000)
+        )
+
+    def book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(self.max_orders)
+        return book
+
+    def submit(self, symbol, side, size, order_type=MARKET, price=None, stop_price=None, timestamp=0.0):
+        """Queue an order; it reaches the book after the latency model's delay
+
+        The order is rejected at once if the symbol already has max_orders orders
+        resting or in flight.
+        """
+        if order_type == LIMIT and price is None:
+            raise ValueError("Limit orders need a price")
+        if order_type == STOP and stop_price is None:
+            raise ValueError("Stop orders need a stop_price")
+        order = Order(next(self.ids), symbol, side, order_type, size, price, stop_price,
+                      timestamp, timestamp + self.latency.delay())
+        book = self.book(symbol)
+        if len(book.pending) + len(book) >= self.max_orders:
+            order.status = 'rejected'
+            return order
+        heapq.heappush(book.pending, (order.active_at, order.id, order))
+        return order
+
+    def cancel(self, order):
+        """Cancel a pending or resting order"""
+        if order.status in ('pending', 'open', 'partial'):
+            self.book(order.symbol).remove(order)
+            order.status = 'cancelled'
+            return True
+        return False
+
+    def market_fill(self, symbol, side, size, price, volume=None, timestamp=0.0):
+        """Fill a market order immediately at price plus slippage, as the live paper path does"""
+        order = Order(next(self.ids), symbol, side, MARKET, size, submitted_at=timestamp, active_at=timestamp)
+        return self.take(order, price, size, volume, timestamp)
+
+    def take(self, order, price, size, volume, timestamp):
+        """Fill size of an order that takes liquidity"""
+        fill_price = self.slippage.price(order.side, price, size, volume)
+        return self.record(order, fill_price, size, False, timestamp)
+
+    def record(self, order, price, size, maker, timestamp):
+        order.filled += size
+        order.status = 'filled' if order.filled >= order.size else 'partial'
+        return {
+            'order_id': order.id,
+            'symbol': order.symbol,
+            'side': order.side,
+            'type': order.type,
+            'price': price,
+            'size': size,
+            'fee': self.fees.fee(price, size, maker),
+            'maker': maker,
+            'timestamp': timestamp
+        }
+
+    def on_tick(self, symbol, timestamp, price, volume=None):
+        return self.on_bar(symbol, timestamp, price, price, price, price, volume)
+
+    def on_bar(self, symbol, timestamp, open_, high, low, close, volume=None):
+        """Match every order of symbol against one bar; returns the fills in order"""
+        book = self.book(symbol)
+        fills = []
+        budget = math.inf if volume is None else self.participation * volume
+
+        # Orders whose latency has elapsed reach the exchange at this bar's open
+        pending = book.pending
+        while pending and pending[0][0] <= timestamp:
+            _, _, order = heapq.heappop(pending)
+            if order.status != 'cancelled':
+                budget = self.activate(book, order, open_, volume, budget, timestamp, fills)
+
+        # Stops inside the bar's range become market orders, filled at the stop or a gap open
+        while book.buy_stops and book.buy_stops[0][0] <= high:
+            _, _, order = book.buy_stops.pop(0)
+            del book.entries[order.id]
+            budget = self.fill_taker(order, max(order.stop_price, open_), volume, budget, timestamp, fills)
+        while book.sell_stops and -book.sell_stops[0][0] >= low:
+            _, _, order = book.sell_stops.pop(0)
+            del book.entries[order.id]
+            budget = self.fill_taker(order, min(order.stop_price, open_), volume, budget, timestamp, fills)
+
+        # Resting limits the bar traded through fill at their price, or at the open if it gapped past
+        budget = self.fill_makers(book, book.bids, lambda key: -key >= low, min, open_, budget, timestamp, fills)
+        self.fill_makers(book, book.asks, lambda key: key <= high, max, open_, budget, timestamp, fills)
+        return fills
+
+    def activate(self, book, order, open_, volume, budget, timestamp, fills):
+        if order.type == MARKET:
+            return self.fill_taker(order, open_, volume, budget, timestamp, fills)
+        if order.type == LIMIT and (open_ <= order.price if order.side == BUY else open_ >= order.price):
+            # Marketable on arrival: takes liquidity at the open
+            budget = self.fill_taker(order, open_, volume, budget, timestamp, fills)
+            if order.remaining <= 0:
+                return budget
+        if not book.add(order):
+            order.status = 'rejected'
+        return budget
+
+    def fill_taker(self, order, price, volume, budget, timestamp, fills):
+        size = min(order.remaining, budget)
+        if size > 0:
+            fill_price = self.slippage.price(order.side, price, size, volume)
+            if order.type == LIMIT:
+                # Slippage never fills a limit order beyond its limit
+                fill_price = min(fill_price, order.price) if order.side == BUY else max(fill_price, order.price)
+            fills.append(self.record(order, fill_price, size, False, timestamp))
+        if order.remaining > 0 and order.type != LIMIT:
+            # Volume ran out: the rest of a market or triggered stop order is cancelled
+            order.status = 'cancelled' if order.filled == 0 else 'partial_cancelled'
+        return budget - size
+
+    def fill_makers(self, book, levels, crossed, better, open_, budget, timestamp, fills):
+        while levels and budget > 0 and crossed(levels[0][0]):
+            _, _, order = levels[0]
+            size = min(order.remaining, budget)
+            fills.append(self.record(order, better(order.price, open_), size, True, timestamp))
+            budget -= size
+            if order.remaining <= 0:
+                levels.pop(0)
+                del book.entries[order.id]
+        return budget
+
+    def on_bars(self, symbol, df):
+        """Replay a DataFrame of bars through on_bar; timestamps are epoch seconds"""
+        fills = []
+        times = df.index.as_unit('ns').asi8 / 1e9
+        columns = [df[column].to_numpy(dtype=float).tolist() for column in ('Open', 'High', 'Low', 'Close', 'Volume')]
+        for timestamp, bar in zip(times.tolist(), zip(*columns)):
+            fills.extend(self.on_bar(symbol, timestamp, *bar))
+        return fills
@@ -0,0 +1,510 @@
+import copy
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+NAN = float('nan')
+
+
+class Ewm:
+    """Exponentially weighted mean updated one value at a time (mirrors pandas ewm)"""
+
+    def __init__(self, alpha, adjust, min_periods=0):
+        self.alpha = alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, value):
+        is_observation = value == value
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= 1.0 - self.alpha
+            if is_observation:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if self.weighted != value:
+                    self.weighted = ((self.old_wt * self.weighted) + (new_wt * value)) / (self.old_wt + new_wt)
+                if self.adjust:
+                    self.old_wt += new_wt
+                else:
+                    self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = value
+        return self.value
+
+    def copy(self):
+        return copy.copy(self)
+
+    @property
+    def value(self):
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class Rolling:
+    """Fixed-size ring buffer with an online mean and population variance"""
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [0.0] * window
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0
+
+    def update(self, value):
+        if self.count == self.window:
+            old = self.buffer[self.pos]
+            self.count -= 1
+            if self.count:
+                delta = old - self.mean
+                self.mean -= delta / self.count
+                self.ssqdm -= (self.count + 1) * delta * delta / self.count
+            else:
+                self.mean = 0.0
+                self.ssqdm = 0.0
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.ssqdm += (self.count - 1) * delta * delta / self.count
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.buffer = list(self.buffer)
+        return clone
+
+    @property
+    def full(self):
+        return self.count == self.window
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.ssqdm / self.count, 0.0))
+
+
+class WilderAtr:
+    """ATR seeded with a simple mean of the first window, as ta computes it"""
+
+    def __init__(self, window):
+        self.window = window
+        self.prev_close = NAN
+        self.count = 0
+        self.tr_sum = 0.0
+        self.atr = 0.0
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.prev_close == self.prev_close:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            self.tr_sum += true_range
+        elif self.count == self.window:
+            self.atr = (self.tr_sum + true_range) / self.window
+        else:
+            self.atr = (self.atr * (self.window - 1) + true_range) / self.window
+        return self.atr
+
+    def copy(self):
+        return copy.copy(self)
+
+
+class IncrementalIndicators:
+    """Stateful indicator engine producing the same columns as calculate_indicators"""
+
+    def __init__(self, config, history=50):
+        self.params = self.indicator_params(config)
+        self.history = history
+        self.reset()
+
+    @staticmethod
+    def indicator_params(config):
+        """The config keys that change indicator values"""
+        return {
+            'symbol': config.get('symbol'),
+            'timeframe': config.get('timeframe'),
+            'ema_fast': config['ema_fast'],
+            'ema_slow': config['ema_slow'],
+            'rsi_period': config['rsi_period'],
+            'atr_period': config['atr_period']
+        }
+
+    def reset(self):
+        """Drop all state so the next bar starts a fresh series"""
+        p = self.params
+        self.state = {
+            'ema_fast': Ewm(2 / (p['ema_fast'] + 1), adjust=True),
+            'ema_slow': Ewm(2 / (p['ema_slow'] + 1), adjust=True),
+            'sma_20': Rolling(20),
+            'rsi_up': Ewm(1 / p['rsi_period'], adjust=False, min_periods=p['rsi_period']),
+            'rsi_down': Ewm(1 / p['rsi_period'], adjust=False, min_periods=p['rsi_period']),
+            'macd_fast': Ewm(2 / 13, adjust=False, min_periods=12),
+            'macd_slow': Ewm(2 / 27, adjust=False, min_periods=26),
+            'macd_signal': Ewm(2 / 10, adjust=False, min_periods=9),
+            'atr': WilderAtr(p['atr_period']),
+            'volume_sma': Rolling(20),
+            'prev_close': NAN
+        }
+        self.snapshot = None
+        self.last_timestamp = None
+        self.last_bar = None
+        self.outputs = deque(maxlen=self.history)
+
+    def update(self, timestamp, high, low, close, volume):
+        """Apply one bar in O(1); a repeated timestamp revises the still-forming candle"""
+        if self.last_timestamp is not None and timestamp == self.last_timestamp:
+            self.state = self.snapshot
+            self.outputs.pop()
+        self.snapshot = {name: (item.copy() if hasattr(item, 'copy') else item)
+                         for name, item in self.state.items()}
+        self.last_timestamp = timestamp
+        self.last_bar = (high, low, close, volume)
+
+        s = self.state
+        p = self.params
+        ema_fast = s['ema_fast'].update(close)
+        ema_slow = s['ema_slow'].update(close)
+
+        s['sma_20'].update(close)
+        sma_20 = s['sma_20'].mean if s['sma_20'].full else NAN
+        bb_std = s['sma_20'].std if s['sma_20'].full else NAN
+
+        # ta treats the first diff as 0 for both directions
+        diff = close - s['prev_close'] if s['prev_close'] == s['prev_close'] else 0.0
+        s['prev_close'] = close
+        up = s['rsi_up'].update(diff if diff > 0 else 0.0)
+        down = s['rsi_down'].update(-diff if diff < 0 else 0.0)
+        if down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + up / down))
+
+        macd_line = s['macd_fast'].update(close) - s['macd_slow'].update(close)
+        macd_signal = s['macd_signal'].update(macd_line)
+
+        atr = s['atr'].update(high, low, close)
+
+        s['volume_sma'].update(volume)
+        volume_sma = s['volume_sma'].mean if s['volume_sma'].full else NAN
+
+        values = {
+            f"ema_{p['ema_fast']}": ema_fast,
+            f"ema_{p['ema_slow']}": ema_slow,
+            'sma_20': sma_20,
+            'rsi': rsi,
+            'macd': macd_line - macd_signal,
+            'macd_signal': macd_signal,
+            'atr': atr,
+            'bb_upper': sma_20 + 2 * bb_std,
+            'bb_middle': sma_20,
+            'bb_lower': sma_20 - 2 * bb_std,
+            'volume_sma': volume_sma,
+            'volume_ratio': self.ratio(volume, volume_sma)
+        }
+        self.outputs.append((timestamp, values))
+        return values
+
+    def seed(self, highs, lows, closes, volumes):
+        """Fold all but the last `history` bars into a fresh state in one vectorized pass
+
+        The cold path would otherwise replay every bar through update() in pure
+        Python. The state after bar m-1 is rebuilt from pandas ewm/rolling columns
+        over the same recurrences, so the remaining bars can go through update() as
+        usual. Returns (m, columns): the number of bars folded in and every indicator
+        column over all bars. m is 0, and nothing changes, when there are too few
+        bars or the bars are not all finite (NaN inputs change the recurrences).
+        """
+        m = len(closes) - self.history
+        if m <= 0 or not all(np.isfinite(a).all() for a in (highs, lows, closes, volumes)):
+            return 0, None
+
+        p = self.params
+        s = self.state
+        close = pd.Series(closes)
+        last = m - 1
+
+        def ewm(ewm_state, series):
+            # The running weighted mean is kept even while the output is masked by min_periods
+            weighted = series.ewm(alpha=ewm_state.alpha, adjust=ewm_state.adjust).mean().to_numpy()
+            nobs = int(np.count_nonzero(~np.isnan(series.to_numpy()[:m])))
+            ewm_state.weighted = float(weighted[last])
+            ewm_state.nobs = nobs
+            if ewm_state.adjust:
+                ewm_state.old_wt = (1 - (1 - ewm_state.alpha) ** nobs) / ewm_state.alpha
+            nobs_all = np.cumsum(~np.isnan(series.to_numpy()))
+            return np.where(nobs_all >= ewm_state.min_periods, weighted, np.nan)
+
+        def rolling(rolling_state, values):
+            window = rolling_state.window
+            count = min(m, window)
+            recent = values[m - count:m]
+            rolling_state.buffer = [0.0] * window
+            for i, value in enumerate(recent.tolist(), m - count):
+                rolling_state.buffer[i % window] = value
+            rolling_state.pos = m % window
+            rolling_state.count = count
+            rolling_state.mean = float(recent.mean())
+            rolling_state.ssqdm = float(((recent - recent.mean()) ** 2).sum())
+            series = pd.Series(values).rolling(window)
+            return series.mean().to_numpy(), series.std(ddof=0).to_numpy()
+
+        ema_fast = ewm(s['ema_fast'], close)
+        ema_slow = ewm(s['ema_slow'], close)
+        sma_20, bb_std = rolling(s['sma_20'], closes)
+
+        diff = close.diff().fillna(0.0)
+        up = ewm(s['rsi_up'], diff.clip(lower=0.0))
+        down = ewm(s['rsi_down'], (-diff).clip(lower=0.0))
+        macd_line = ewm(s['macd_fast'], close) - ewm(s['macd_slow'], close)
+        macd_signal = ewm(s['macd_signal'], pd.Series(macd_line))
+
+        atr_state = s['atr']
+        window = atr_state.window
+        previous = np.concatenate(([np.nan], closes[:-1]))
+        true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - previous), np.abs(lows - previous)))
+        atr = np.zeros(len(closes))
+        if len(closes) >= window:
+            seeded = true_range[window - 1:].copy()
+            seeded[0] = true_range[:window].mean()
+            atr[window - 1:] = pd.Series(seeded).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+        atr_state.prev_close = float(closes[last])
+        atr_state.count = m
+        atr_state.tr_sum = float(true_range[:min(m, window - 1)].sum())
+        atr_state.atr = float(atr[last])
+        s['prev_close'] = float(closes[last])
+
+        volume_sma, _ = rolling(s['volume_sma'], volumes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(down == 0, 100.0, 100 - (100 / (1 + up / down)))
+            volume_ratio = volumes / volume_sma
+
+        columns = {
+            f"ema_{p['ema_fast']}": ema_fast,
+            f"ema_{p['ema_slow']}": ema_slow,
+            'sma_20': sma_20,
+            'rsi': rsi,
+            'macd': macd_line - macd_signal,
+            'macd_signal': macd_signal,
+            'atr': atr,
+            'bb_upper': sma_20 + 2 * bb_std,
+            'bb_middle': sma_20,
+            'bb_lower': sma_20 - 2 * bb_std,
+            'volume_sma': volume_sma,
+            'volume_ratio': volume_ratio
+        }
+        return m, columns
+
+    @staticmethod
+    def ratio(numerator, denominator):
+        """Divide like pandas does, giving inf or NaN instead of raising"""
+        if denominator == 0:
+            return math.copysign(math.inf, numerator) if numerator else NAN
+        return numerator / denominator
+
+    def apply(self, df):
+        """Feed bars of df newer than the engine state and attach indicator columns"""
+        bars = [df[name].to_numpy(dtype=float) for name in ('High', 'Low', 'Close', 'Volume')]
+        if self.last_timestamp is None or self.last_timestamp not in df.index:
+            # No overlap with the previous frame: start over, seeding all but the kept outputs in one pass
+            self.reset()
+            start, _ = self.seed(*bars)
+        else:
+            start = df.index.get_loc(self.last_timestamp)
+
+        index = df.index[start:]
+        highs, lows, closes, volumes = (values[start:].tolist() for values in bars)
+        for bar in zip(index, highs, lows, closes, volumes):
+            self.update(*bar)
+
+        if not self.outputs:
+            return df
+        # Every output dict has the same keys in the same order; one 2-D array is much
+        # cheaper for pandas to take than a list of dicts
+        columns = list(self.outputs[-1][1])
+        values = np.array([list(values.values()) for _, values in self.outputs], dtype=float)
+        frame = pd.DataFrame(values, index=pd.DatetimeIndex([ts for ts, _ in self.outputs]), columns=columns)
+        frame = frame.reindex(df.index)
+        return pd.concat([df.drop(columns=frame.columns, errors='ignore'), frame], axis=1)
+
+    def apply_window(self, window, first=0):
+        """Feed a BarWindow's rows from first on and write indicator values into it in place"""
+        stamps = window.timestamps[window.start:window.end]
+        start = 0
+        if self.last_timestamp is not None:
+            start = int(stamps.searchsorted(self.last_timestamp.value))
+        if self.last_timestamp is None or start == len(stamps) or stamps[start] != self.last_timestamp.value:
+            # No overlap with the engine state: start over, seeding the older rows in one pass
+            self.reset()
+            start, columns = self.seed(*(window.column(name).astype(float)
+                                         for name in ('High', 'Low', 'Close', 'Volume')))
+            if start:
+                for name, values in columns.items():
+                    window.column(name)[first:start] = values[first:start]
+                first = start
+
+        # Reloaded rows older than the engine state only have its recent outputs
+        if first < start:
+            recent = {ts.value: values for ts, values in self.outputs}
+            for position in range(first, start):
+                if stamps[position] in recent:
+                    window.set(position, recent[stamps[position]])
+
+        index = window.index[start:]
+        highs = window.column('High')[start:].tolist()
+        lows = window.column('Low')[start:].tolist()
+        closes = window.column('Close')[start:].tolist()
+        volumes = window.column('Volume')[start:].tolist()
+        for position, bar in enumerate(zip(index, highs, lows, closes, volumes), start):
+            window.set(position, self.update(*bar))
+        return window
+
+    def to_dict(self):
+        """Serialize the engine state before the last bar plus that bar"""
+        base = self.snapshot if self.snapshot is not None else self.state
+        return {
+            'params': self.params,
+            'state': {name: (vars(item) if hasattr(item, '__dict__') else item)
+                      for name, item in base.items()},
+            'last_timestamp': str(self.last_timestamp) if self.last_timestamp is not None else None,
+            'last_bar': self.last_bar,
+            'outputs': [(str(ts), values) for ts, values in self.outputs]
+        }
+
+    @classmethod
+    def from_dict(cls, config, data, history=50):
+        """Restore an engine, or return a fresh one if the params do not match config"""
+        engine = cls(config, history)
+        if data.get('params') != engine.params or data.get('last_timestamp') is None:
+            return engine
+
+        for name, item in engine.state.items():
+            if hasattr(item, '__dict__'):
+                vars(item).update(data['state'][name])
+            else:
+                engine.state[name] = data['state'][name]
+        outputs = [(pd.Timestamp(ts), values) for ts, values in data['outputs']]
+        engine.outputs.extend(outputs[:-1])
+
+        # Re-apply the last bar so it can still be revised
+        engine.update(pd.Timestamp(data['last_timestamp']), *data['last_bar'])
+        return engine
+
+    def to_arrays(self):
+        """The checkpoint as flat NumPy arrays: scalars in one float vector, buffers and outputs as blocks"""
+        data = self.to_dict()
+        names, scalars, types, arrays = [], [], {}, {}
+        for name, item in data['state'].items():
+            fields = item.items() if isinstance(item, dict) else [(None, item)]
+            for field, value in fields:
+                key = name if field is None else f"{name}.{field}"
+                if isinstance(value, list):
+                    arrays[f"buffer.{key}"] = np.array(value, dtype=float)
+                    continue
+                names.append(key)
+                scalars.append(value)
+                if isinstance(value, (bool, int)):
+                    # Ring buffer positions and flags go back to their own type
+                    types[key] = type(value).__name__
+
+        outputs = list(self.outputs)
+        columns = list(outputs[0][1]) if outputs else []
+        tz = str(outputs[0][0].tz) if outputs and outputs[0][0].tz is not None else None
+        header = {
+            'version': 1,
+            'params': data['params'],
+            'scalars': names,
+            'types': types,
+            'columns': columns,
+            'tz': tz,
+            'last_timestamp': data['last_timestamp']
+        }
+        return {
+            'header': np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+            'scalars': np.array(scalars, dtype=float),
+            'last_bar': np.array(data['last_bar'] if data['last_bar'] is not None else [], dtype=float),
+            'output_times': np.array([ts.value for ts, _ in outputs], dtype='int64'),
+            'output_values': np.array([[values[c] for c in columns] for _, values in outputs], dtype=float),
+            **arrays
+        }
+
+    @classmethod
+    def from_arrays(cls, config, arrays, history=50):
+        """Rebuild the to_dict() layout from to_arrays() output and restore it"""
+        header = json.loads(arrays['header'].tobytes())
+        state = {}
+        for key, value in zip(header['scalars'], arrays['scalars'].tolist()):
+            if key in header['types']:
+                value = {'int': int, 'bool': bool}[header['types'][key]](value)
+            name, _, field = key.partition('.')
+            if field:
+                state.setdefault(name, {})[field] = value
+            else:
+                state[name] = value
+        for key in arrays:
+            if key.startswith('buffer.'):
+                name, field = key[len('buffer.'):].split('.', 1)
+                state.setdefault(name, {})[field] = arrays[key].tolist()
+
+        times = pd.to_datetime(arrays['output_times'], utc=True)
+        if header['tz'] is not None:
+            times = times.tz_convert(header['tz'])
+        else:
+            times = times.tz_localize(None)
+        outputs = [(str(ts), dict(zip(header['columns'], row)))
+                   for ts, row in zip(times, arrays['output_values'].tolist())]
+        return cls.from_dict(config, {
+            'params': header['params'],
+            'state': state,
+            'last_timestamp': header['last_timestamp'],
+            'last_bar': arrays['last_bar'].tolist(),
+            'outputs': outputs
+        }, history)
+
+    def save(self, path):
+        """Write a checkpoint atomically: compact binary .npz, or JSON for a .json path"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb' if not path.endswith('.json') else 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.to_dict(), f)
+            else:
+                np.savez(f, **self.to_arrays())
+            METRICS.count('bytes_checkpoint', f.tell())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, config, path, history=50):
+        """Load a checkpoint if present and compatible with config"""
+        try:
+            if os.path.exists(path):
+                if path.endswith('.json'):
+                    with open(path, 'r') as f:
+                        return cls.from_dict(config, json.load(f), history)
+                with np.load(path) as arrays:
+                    return cls.from_arrays(config, arrays, history)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError, OSError):
+            print("Error reading indicator checkpoint, rebuilding indicators")
+        return cls(config, history)
+
+    @property
+    def bars_seen(self):
+        """Bars applied since the last reset"""
+        return self.state['ema_slow'].nobs
+
+    def warmup_bars(self):
+        """Bars after which every indicator is past its start-up values"""
+        p = self.params
+        return max(p['ema_slow'], p['ema_fast'], p['rsi_period'], p['atr_period'], 26 + 9, 20)
+
+    def resume_from(self):
+        """Oldest bar the engine still has outputs for, or None without state"""
+        return self.outputs[0][0] if self.outputs else None
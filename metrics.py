@@ -0,0 +1,190 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Log-spaced bucket upper bounds from 1µs to ~15 minutes, 25% apart
+BUCKETS = [1e-6 * 1.25 ** k for k in range(93)]
+
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with approximate percentiles
+
+    Stages are timed from worker threads (portfolio and strategy_runner
+    prepare), so observations take the histogram's lock.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        """Interpolate the q-th percentile (0-100) inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class _Stage:
+    """Times one block into a histogram"""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Registry of per-stage timings and counters; a no-op until enabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def stage(self, name):
+        """Context manager timing a stage; free when metrics are disabled"""
+        if not self.enabled:
+            return _DISABLED
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return _Stage(histogram)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Plain-dict view of every histogram and counter"""
+        stages = {}
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for name, h in histograms:
+            with h.lock:
+                stages[name] = {
+                    'count': h.count,
+                    'total_ms': h.sum * 1000,
+                    'p50_ms': h.percentile(50) * 1000,
+                    'p95_ms': h.percentile(95) * 1000,
+                    'p99_ms': h.percentile(99) * 1000,
+                    'max_ms': h.max * 1000
+                }
+        with self.lock:
+            counters = dict(sorted(self.counters.items()))
+        return {'stages': stages, 'counters': counters}
+
+    def write(self, path='metrics.json'):
+        """Write a snapshot to a local metrics file"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self):
+        """Render metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP algotrader_stage_seconds Time spent per trading cycle stage',
+            '# TYPE algotrader_stage_seconds histogram'
+        ]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for name, h in histograms:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'algotrader_stage_seconds_bucket{{stage="{name}",le="{bound:.9g}"}} {cumulative}')
+            lines.append(f'algotrader_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+            lines.append(f'algotrader_stage_seconds_sum{{stage="{name}"}} {h.sum:.9g}')
+            lines.append(f'algotrader_stage_seconds_count{{stage="{name}"}} {h.count}')
+        for name, value in counters:
+            lines.append(f'# TYPE algotrader_{name}_total counter')
+            lines.append(f'algotrader_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """Serve /metrics for Prometheus from a daemon thread"""
+        # Imported here so scheduled runs that never serve do not pay for it
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def print_report(self):
+        snapshot = self.snapshot()
+        print("\n=== Stage Timings ===")
+        for name, s in snapshot['stages'].items():
+            print(f"{name:<18} n={s['count']:<6} p50={s['p50_ms']:.3f}ms "
+                  f"p95={s['p95_ms']:.3f}ms p99={s['p99_ms']:.3f}ms max={s['max_ms']:.3f}ms")
+        for name, value in snapshot['counters'].items():
+            print(f"{name:<18} {value:,}")
+        print("=====================\n")
+
+
+def env_flag(name):
+    """True unless the variable is unset, empty, 0, false, no or off"""
+    return os.environ.get(name, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+# Process-wide registry; enable with ALGO_METRICS=1 or the 'metrics' config key
+METRICS = Metrics(enabled=env_flag('ALGO_METRICS'))
@@ -0,0 +1,362 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from optimizer import walk_forward_splits
+
+# Source bar flags, packed into one byte per bar
+HELD = 1     # a position is open over this bar's return
+OPENS = 2    # a position is opened at this bar's close
+CLOSES = 4   # the position is closed at this bar's close
+
+# Paths per task: big enough to amortize NumPy call overhead, small enough to stay in cache
+PATHS_PER_TASK = 10_000
+
+# Trades of random draws generated at a time
+DRAW_CHUNK = 256
+
+
+def _simulate_bars(task):
+    """Run one batch of block-bootstrapped bar paths (runs in a worker process)"""
+    source, params, n_paths, n_bars, seed = task
+    block = params['block_size']
+    # Circular blocks: pad the source with its first bars so block rows never wrap
+    n_source = len(source['growth'])
+    flags = np.r_[source['flags'], source['flags'][:block]]
+    # Bars without a position leave the mark unchanged, so a path that left its trade
+    # closes at the last mark
+    growth = np.where((flags & HELD) != 0, np.r_[source['growth'], source['growth'][:block]], 1.0)
+    offsets = np.arange(block)[:, None]
+    rng = np.random.default_rng(seed)
+
+    initial = params['initial_balance']
+    fraction = params['risk_percent'] / 100
+    # execute_trade sizes the position with leverage and multiplies the P&L by it again
+    exposure = params['leverage'] ** 2
+    # Price ratio to entry at which the loss equals the posted margin
+    call_level = 1 - 1 / exposure
+    liquidate = params['liquidate']
+
+    cash = np.full(n_paths, float(initial))
+    margin = np.zeros(n_paths)
+    notional = np.zeros(n_paths)
+    gross = np.ones(n_paths)
+    # Equity is base + notional * gross, so base only changes when a position opens or closes
+    base = cash.copy()
+    in_position = np.zeros(n_paths, dtype=bool)
+    underwater = np.zeros(n_paths, dtype=bool)
+    peak = cash.copy()
+    low_ratio = np.ones(n_paths)
+    min_equity = cash.copy()
+    margin_calls = np.zeros(n_paths, dtype=np.int32)
+    trades = np.zeros(n_paths, dtype=np.int32)
+    equity = cash.copy()
+    ratio = np.empty(n_paths)
+
+    # Block buffers are reused: fresh multi-megabyte arrays per block cost page faults
+    rows = np.empty((block, n_paths), dtype=np.intp)
+    growth_block = np.empty((block, n_paths))
+    flag_block = np.empty((block, n_paths), dtype=np.uint8)
+    masked = np.empty((block, n_paths), dtype=np.uint8)
+    held_block = np.empty((block, n_paths), dtype=bool)
+    stays_block = np.empty((block, n_paths), dtype=bool)
+    opens_block = np.empty((block, n_paths), dtype=bool)
+
+    for block_start in range(0, n_bars, block):
+        steps = min(block, n_bars - block_start)
+        # Every path copies `steps` consecutive source bars from its own random start
+        np.add(rng.integers(0, n_source, n_paths), offsets, out=rows)
+        np.take(growth, rows, out=growth_block)
+        np.take(flags, rows, out=flag_block)
+        np.not_equal(np.bitwise_and(flag_block, HELD, out=masked), 0, out=held_block)
+        np.equal(np.bitwise_and(flag_block, HELD | CLOSES, out=masked), HELD, out=stays_block)
+        np.not_equal(np.bitwise_and(flag_block, OPENS, out=masked), 0, out=opens_block)
+
+        for t in range(steps):
+            # Flat paths drift too, but their notional is zero and gross resets on entry
+            gross *= growth_block[t]
+            held = in_position & held_block[t]
+
+            # Loss beyond the posted margin; counted once per position
+            called = gross <= call_level
+            called &= held
+            if liquidate:
+                margin_calls += called
+            else:
+                margin_calls += called > underwater
+                underwater |= called
+
+            # Close on the strategy's exit, a liquidation, or when the block left the trade
+            closing = in_position > (held & stays_block[t])
+            if liquidate:
+                closing |= called
+            closed = np.flatnonzero(closing)
+            if len(closed):
+                balance = cash[closed] + margin[closed] + notional[closed] * (gross[closed] - 1)
+                cash[closed] = balance
+                base[closed] = balance
+                margin[closed] = 0.0
+                notional[closed] = 0.0
+                in_position[closed] = False
+                underwater[closed] = False
+
+            # Open like execute_trade: margin is risk_percent of the balance, refused once it is gone
+            opened = np.flatnonzero(opens_block[t] > in_position)
+            if len(opened):
+                opened = opened[cash[opened] > 0]
+                balance = cash[opened]
+                posted = balance * fraction
+                cash[opened] = balance - posted
+                margin[opened] = posted
+                notional[opened] = posted * exposure
+                base[opened] = balance - posted * exposure
+                gross[opened] = 1.0
+                in_position[opened] = True
+                trades[opened] += 1
+
+            np.multiply(notional, gross, out=equity)
+            equity += base
+            np.maximum(peak, equity, out=peak)
+            np.divide(equity, peak, out=ratio)
+            np.minimum(low_ratio, ratio, out=low_ratio)
+            np.minimum(min_equity, equity, out=min_equity)
+
+    return {
+        'final_equity': equity,
+        'max_drawdown': 1 - low_ratio,
+        'min_equity': min_equity,
+        'ruined': min_equity <= params['ruin_level'] * initial,
+        'margin_calls': margin_calls,
+        'trades': trades
+    }
+
+
+def _simulate_trades(task):
+    """Run one batch of trade-sequence bootstrap paths (runs in a worker process)"""
+    source, params, n_paths, n_trades, seed = task
+    returns = source['returns']
+    liquidation = source['liquidation']
+    rng = np.random.default_rng(seed)
+
+    initial = params['initial_balance']
+    fraction = params['risk_percent'] / 100
+    exposure = params['leverage'] ** 2
+    ruin_equity = params['ruin_level'] * initial
+    called_returns = returns
+    if params['liquidate']:
+        called_returns = np.where(np.isnan(liquidation), returns, liquidation)
+
+    cash = np.full(n_paths, float(initial))
+    peak = cash.copy()
+    max_drawdown = np.zeros(n_paths)
+    min_equity = cash.copy()
+    ruined = np.zeros(n_paths, dtype=bool)
+    margin_calls = np.zeros(n_paths, dtype=np.int32)
+    trades = np.zeros(n_paths, dtype=np.int32)
+
+    for chunk_start in range(0, n_trades, DRAW_CHUNK):
+        steps = min(DRAW_CHUNK, n_trades - chunk_start)
+        draws = rng.integers(0, len(returns), (steps, n_paths))
+        for t in range(steps):
+            pick = draws[t]
+            trading = cash > 0
+            margin = cash * fraction
+            cash += np.where(trading, margin * exposure * called_returns[pick], 0.0)
+            margin_calls += trading & ~np.isnan(liquidation[pick])
+            trades += trading
+            np.maximum(peak, cash, out=peak)
+            np.maximum(max_drawdown, 1 - cash / peak, out=max_drawdown)
+            np.minimum(min_equity, cash, out=min_equity)
+            ruined |= cash <= ruin_equity
+
+    return {
+        'final_equity': cash,
+        'max_drawdown': max_drawdown,
+        'min_equity': min_equity,
+        'ruined': ruined,
+        'margin_calls': margin_calls,
+        'trades': trades
+    }
+
+
+class MonteCarloSimulator:
+    """Bootstrap a strategy's history into many alternative paths and measure leverage risk
+
+    Paths replay the account math of execute_trade: the margin is risk_percent of
+    the balance and the P&L is margin * leverage**2 * price return. A margin call
+    is a mark-to-market loss larger than the posted margin; ruin is equity at or
+    below ruin_level times the initial balance.
+    """
+
+    def __init__(self, config, n_paths=100_000, n_bars=10_000, block_size=20, ruin_level=0.0,
+                 liquidate=True, max_workers=None, seed=None):
+        self.config = config
+        self.n_paths = n_paths
+        self.n_bars = n_bars
+        self.block_size = block_size
+        self.ruin_level = ruin_level
+        self.liquidate = liquidate
+        self.max_workers = max_workers or os.cpu_count()
+        self.seed = seed
+        # Entries and exits do not depend on leverage, but at high leverage the
+        # backtest account goes broke and stops trading, so positions come from 1x
+        self.backtester = Backtester(dict(config, leverage=1))
+
+    def params(self, leverage):
+        return {
+            'initial_balance': self.config['initial_balance'],
+            'risk_percent': self.config['risk_percent'],
+            'leverage': leverage,
+            'block_size': self.block_size,
+            'ruin_level': self.ruin_level,
+            'liquidate': self.liquidate
+        }
+
+    def backtest(self, df, start=0, end=None):
+        """Close prices and (entry, exit) bars of a backtest on bars [start, end)"""
+        arrays = self.backtester.signal_arrays(df)
+        results = self.backtester.simulate(arrays, start, end, timestamps=False)
+        end = len(df) if end is None else end
+        fills = [(entry - start, exit_ - start if exit_ >= 0 else -1) for entry, exit_ in results['fills']]
+        return arrays['close'][start:end], fills
+
+    def bar_source(self, close, fills):
+        """Per-bar price growth and position flags to resample"""
+        growth = np.r_[1.0, close[1:] / close[:-1]]
+        flags = np.zeros(len(close), dtype=np.uint8)
+        for entry, exit_ in fills:
+            last = len(close) - 1 if exit_ < 0 else exit_
+            flags[entry] |= OPENS
+            flags[entry + 1:last + 1] |= HELD
+            if exit_ >= 0:
+                flags[exit_] |= CLOSES
+        return {'growth': growth, 'flags': flags}
+
+    def trade_source(self, close, fills, leverage):
+        """Per-trade price return, and the return at the first close that wiped out the margin"""
+        threshold = -1 / leverage ** 2
+        returns = []
+        liquidation = []
+        for entry, exit_ in fills:
+            if exit_ < 0:
+                continue
+            path = close[entry + 1:exit_ + 1] / close[entry] - 1
+            returns.append(path[-1])
+            called = np.flatnonzero(path <= threshold)
+            liquidation.append(path[called[0]] if len(called) else np.nan)
+        return {'returns': np.array(returns), 'liquidation': np.array(liquidation)}
+
+    def run(self, df, leverages=None, start=0, end=None):
+        """Bootstrap blocks of bars with the strategy's position state, one row per leverage"""
+        leverages = leverages or [self.config.get('leverage', 1)]
+        close, fills = self.backtest(df, start, end)
+        source = self.bar_source(close, fills)
+        tasks = [(source, self.params(leverage)) for leverage in leverages]
+        return self.run_tasks(_simulate_bars, tasks, self.n_bars, leverages)
+
+    def run_trades(self, df, leverages=None, n_trades=None, start=0, end=None):
+        """Bootstrap the sequence of closed trades, one row per leverage"""
+        leverages = leverages or [self.config.get('leverage', 1)]
+        close, fills = self.backtest(df, start, end)
+        tasks = []
+        for leverage in leverages:
+            source = self.trade_source(close, fills, leverage)
+            if not len(source['returns']):
+                raise ValueError("The backtest closed no trades to resample")
+            tasks.append((source, self.params(leverage)))
+        n_trades = n_trades or len(fills)
+        return self.run_tasks(_simulate_trades, tasks, n_trades, leverages)
+
+    def walk_forward(self, df, leverages=None, n_splits=4, train_fraction=0.75):
+        """Run the bar bootstrap on each out-of-sample fold separately"""
+        tables = []
+        for fold, (_, (test_start, test_end)) in enumerate(walk_forward_splits(len(df), n_splits, train_fraction)):
+            table = self.run(df, leverages, test_start, test_end)
+            table.insert(0, 'fold', fold)
+            tables.append(table)
+        return pd.concat(tables, ignore_index=True)
+
+    def run_tasks(self, worker, sources, length, leverages):
+        """Split every source into path batches, run them on the pool and summarize per leverage"""
+        batches = [min(PATHS_PER_TASK, self.n_paths - offset)
+                   for offset in range(0, self.n_paths, PATHS_PER_TASK)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sources) * len(batches))
+        tasks = [(source, params, n_paths, length, seeds[i * len(batches) + j])
+                 for i, (source, params) in enumerate(sources)
+                 for j, n_paths in enumerate(batches)]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(worker, tasks))
+
+        rows = []
+        for i, leverage in enumerate(leverages):
+            parts = results[i * len(batches):(i + 1) * len(batches)]
+            paths = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+            rows.append(dict(leverage=leverage, **self.summarize(paths)))
+        return pd.DataFrame(rows)
+
+    def summarize(self, paths):
+        """Distribution statistics over all paths"""
+        initial = self.config['initial_balance']
+        drawdown = np.minimum(paths['max_drawdown'], 1.0) * 100
+        final = paths['final_equity']
+        return {
+            'ruin_pct': paths['ruined'].mean() * 100,
+            'margin_call_pct': (paths['margin_calls'] > 0).mean() * 100,
+            'margin_calls': paths['margin_calls'].mean(),
+            'loss_pct': (final < initial).mean() * 100,
+            'drawdown_p50': np.percentile(drawdown, 50),
+            'drawdown_p95': np.percentile(drawdown, 95),
+            'drawdown_p99': np.percentile(drawdown, 99),
+            'final_p5': np.percentile(final, 5),
+            'final_p50': np.percentile(final, 50),
+            'final_p95': np.percentile(final, 95),
+            'trades': paths['trades'].mean()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo drawdown and ruin statistics per leverage')
+    parser.add_argument('profile', nargs='?', default='conservative', choices=['conservative', 'aggressive'])
+    parser.add_argument('--leverage', type=float, nargs='+')
+    parser.add_argument('--paths', type=int, default=100_000)
+    parser.add_argument('--bars', type=int, default=10_000)
+    parser.add_argument('--block', type=int, default=20, help='bootstrap block length in bars')
+    parser.add_argument('--ruin', type=float, default=0.0, help='ruin level as a fraction of the initial balance')
+    parser.add_argument('--no-liquidation', action='store_true', help='keep positions open after a margin call')
+    parser.add_argument('--trades', action='store_true', help='resample closed trades instead of bars')
+    parser.add_argument('--walk-forward', type=int, metavar='SPLITS', help='simulate each out-of-sample fold')
+    parser.add_argument('--synthetic', type=int, metavar='BARS', help='use synthetic bars instead of Yahoo data')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.profile == 'aggressive':
+        from aggressive_config import CONFIG
+    else:
+        from conservative_config import CONFIG
+
+    simulator = MonteCarloSimulator(CONFIG, args.paths, args.bars, args.block, args.ruin,
+                                    not args.no_liquidation, seed=args.seed)
+    if args.synthetic:
+        from synthetic_data import generate_ohlcv
+        df = generate_ohlcv(args.synthetic, CONFIG['timeframe'], volatility=0.002, seed=args.seed)
+    else:
+        df = simulator.backtester.get_historical_data()
+
+    if args.trades:
+        table = simulator.run_trades(df, args.leverage)
+    elif args.walk_forward:
+        table = simulator.walk_forward(df, args.leverage, args.walk_forward)
+    else:
+        table = simulator.run(df, args.leverage)
+    pd.set_option('display.width', 200)
+    print(f"\n=== Monte Carlo: {CONFIG['symbol']} ({CONFIG['timeframe']}), {args.paths:,} paths ===")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+
+
+if __name__ == '__main__':
+    main()
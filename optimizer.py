@@ -0,0 +1,162 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from bar_store import COLUMNS
+from indicator_engine import IncrementalIndicators
+
+# Worker-process state: the shared OHLCV frame, its indicator cache and the folds
+_worker = {}
+
+
+def walk_forward_splits(n_bars, n_splits=4, train_fraction=0.75):
+    """Rolling (train, test) bar ranges that move forward through the data"""
+    window = n_bars // n_splits
+    train = int(window * train_fraction)
+    splits = []
+    for i in range(n_splits):
+        start = i * window
+        end = n_bars if i == n_splits - 1 else start + window
+        splits.append(((start, start + train), (start + train, end)))
+    return splits
+
+
+def _attach_shared_bars(name, n_bars, tz, splits):
+    """Worker initializer: map the shared OHLCV block once per process; tz None keeps a naive index"""
+    shm = shared_memory.SharedMemory(name=name)
+    timestamps = np.ndarray((n_bars,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((n_bars, len(COLUMNS)), dtype=np.float64, buffer=shm.buf, offset=n_bars * 8)
+    index = pd.to_datetime(timestamps, utc=True)
+    index = index.tz_convert(tz) if tz is not None else index.tz_localize(None)
+    _worker['shm'] = shm
+    _worker['df'] = pd.DataFrame(values, index=index, columns=COLUMNS, copy=False)
+    _worker['cache'] = {}
+    _worker['splits'] = splits
+
+
+def _evaluate(config):
+    """Backtest one config on every walk-forward fold (runs in a worker process)"""
+    backtester = Backtester(config)
+    arrays = backtester.signal_arrays(_worker['df'], _worker['cache'])
+    folds = []
+    for (train_start, train_end), (test_start, test_end) in _worker['splits']:
+        train = backtester.metrics(backtester.simulate(arrays, train_start, train_end, timestamps=False))
+        test = backtester.metrics(backtester.simulate(arrays, test_start, test_end, timestamps=False))
+        folds.append((train, test))
+    return folds
+
+
+class ParameterOptimizer:
+    """Grid search over strategy parameters with walk-forward validation"""
+
+    def __init__(self, base_config, grid, n_splits=4, train_fraction=0.75, max_workers=None):
+        self.base_config = base_config
+        self.grid = grid
+        self.n_splits = n_splits
+        self.train_fraction = train_fraction
+        self.max_workers = max_workers or os.cpu_count()
+
+    def configs(self):
+        """Every valid combination of the grid applied to the base config"""
+        keys = list(self.grid)
+        configs = []
+        for values in itertools.product(*(self.grid[key] for key in keys)):
+            config = dict(self.base_config, **dict(zip(keys, values)))
+            if config['ema_fast'] >= config['ema_slow']:
+                continue
+            configs.append(config)
+        # Neighbouring tasks share indicator parameters, so worker caches get reused
+        configs.sort(key=lambda c: tuple(IncrementalIndicators.indicator_params(c).values()))
+        return configs
+
+    def run(self, df):
+        """Evaluate the grid on df and return a ranked table"""
+        configs = self.configs()
+        splits = walk_forward_splits(len(df), self.n_splits, self.train_fraction)
+        n_bars = len(df)
+
+        # One shared block: int64 timestamps followed by row-major float64 OHLCV
+        shm = shared_memory.SharedMemory(create=True, size=n_bars * 8 * (1 + len(COLUMNS)))
+        try:
+            timestamps = np.ndarray((n_bars,), dtype=np.int64, buffer=shm.buf)
+            # Naive indexes are stored as their wall-clock values and stay naive in the workers
+            index = df.index if df.index.tz is None else df.index.tz_convert('UTC')
+            timestamps[:] = index.as_unit('ns').asi8
+            values = np.ndarray((n_bars, len(COLUMNS)), dtype=np.float64, buffer=shm.buf, offset=n_bars * 8)
+            values[:] = df[COLUMNS].to_numpy(dtype=float)
+            del timestamps, values
+
+            chunksize = max(1, len(configs) // (self.max_workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_attach_shared_bars,
+                initargs=(shm.name, n_bars, str(df.index.tz) if df.index.tz is not None else None, splits)
+            ) as pool:
+                results = list(pool.map(_evaluate, configs, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.selection = self.walk_forward(configs, results)
+        return self.rank(configs, results)
+
+    def rank(self, configs, results):
+        """Average fold metrics per config, sorted by in-sample Sharpe like walk_forward picks
+
+        Sorting by the test columns would select on out-of-sample data; they are
+        shown only to see how each in-sample ranking held up.
+        """
+        rows = []
+        for config, folds in zip(configs, results):
+            row = {key: config[key] for key in self.grid}
+            for prefix, position in (('train', 0), ('test', 1)):
+                for metric in ('return', 'max_drawdown', 'sharpe', 'trades'):
+                    row[f"{prefix}_{metric}"] = float(np.mean([fold[position][metric] for fold in folds]))
+            rows.append(row)
+        table = pd.DataFrame(rows)
+        return table.sort_values(['train_sharpe', 'train_return'], ascending=False).reset_index(drop=True)
+
+    def walk_forward(self, configs, results):
+        """Per fold, the config with the best in-sample Sharpe and its out-of-sample metrics"""
+        rows = []
+        for fold in range(self.n_splits):
+            best = max(range(len(configs)), key=lambda i: results[i][fold][0]['sharpe'])
+            train, test = results[best][fold]
+            row = {'fold': fold}
+            row.update({key: configs[best][key] for key in self.grid})
+            row.update({'train_sharpe': train['sharpe']})
+            row.update({f"test_{metric}": value for metric, value in test.items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    # Usage: python optimizer.py [conservative|aggressive]
+    profile = sys.argv[1] if len(sys.argv) > 1 else 'conservative'
+    if profile == 'aggressive':
+        from aggressive_config import CONFIG
+    else:
+        from conservative_config import CONFIG
+
+    grid = {
+        'rsi_period': [7, 14, 21],
+        'ema_fast': [8, 20, 50],
+        'ema_slow': [13, 50, 200],
+        'atr_period': [14],
+        'profit_target': [0.3, 1.0, 2.0],
+        'stop_loss': [0.2, 0.5, 1.0],
+        'min_conditions': [1, 2, 3, 4]
+    }
+    optimizer = ParameterOptimizer(CONFIG, grid)
+    df = Backtester(CONFIG).get_historical_data()
+    table = optimizer.run(df)
+    pd.set_option('display.width', 200)
+    print(table.head(20).to_string())
+    print("\n=== Walk-Forward Selection ===")
+    print(optimizer.selection.to_string())
@@ -0,0 +1,113 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_client import backoff_delay
+from metrics import METRICS
+from trading_bot import AlgoTrader
+
+
+class PortfolioTrader:
+    """Trade many symbols against one shared paper account
+
+    Fetches run concurrently in a thread pool, which overlaps the network waits.
+    The indicator engine is pure Python and holds the GIL, so indicator updates
+    on those threads effectively run one after another.
+    """
+
+    def __init__(self, config, data_source=None, max_workers=None):
+        self.config = config
+        self.symbols = config.get('symbols') or [config['symbol']]
+        self.max_workers = max_workers or config.get('max_workers', min(32, len(self.symbols)))
+
+        # One trader per symbol, all mutating the same account dict
+        first = AlgoTrader(dict(config, symbol=self.symbols[0]), data_source)
+        self.account = first.account
+        self.traders = [first] + [
+            AlgoTrader(dict(config, symbol=symbol), first.data_source, account=self.account)
+            for symbol in self.symbols[1:]
+        ]
+
+    def prepare(self, trader):
+        """Fetch bars and compute indicators for one symbol (runs in a worker thread)"""
+        with METRICS.stage('fetch'):
+            df = trader.get_historical_data()
+        METRICS.count('rows_fetched', len(df))
+        with METRICS.stage('indicators'):
+            return trader.calculate_indicators(df)
+
+    def margin_in_use(self):
+        """Total margin locked in open positions"""
+        return sum(position['margin'] for position in self.account['positions'].values())
+
+    def run_once(self):
+        """Run one cycle: concurrent fetch and indicators, then signals and trades in order"""
+        cycle_start = time.time()
+        print(f"\nFetching market data for {len(self.traders)} symbols...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [(trader, pool.submit(self.prepare, trader)) for trader in self.traders]
+            frames = []
+            for trader, future in futures:
+                try:
+                    frames.append((trader, future.result()))
+                except Exception as e:
+                    print(f"Error fetching {trader.symbol}: {str(e)}")
+        fetch_time = time.time() - cycle_start
+
+        # Advance every open position's trailing stop in one pass before the signals read them
+        if self.config.get('trailing_stop'):
+            self.traders[0].risk.update_trailing_stops(self.account['positions'],
+                                                       {trader.symbol: df for trader, df in frames})
+
+        # Signals read the shared positions, so they run after every frame is ready
+        signals = []
+        for trader, df in frames:
+            trader.df = trader.generate_signals(df)
+            if trader.indicator_engine is not None:
+                trader.indicator_engine.save(trader.indicator_checkpoint)
+            signals.append((trader, int(df['signal'].iloc[-1]), float(df['Close'].iloc[-1]), df.index[-1],
+                            float(df['Volume'].iloc[-1])))
+
+        # Close positions before opening new ones so freed margin can be reused
+        for trader, signal, price, timestamp, volume in sorted(signals, key=lambda s: s[1]):
+            if signal != 0:
+                print(f"{trader.symbol} signal detected: {'BUY' if signal == 1 else 'SELL'}")
+                trader.execute_trade(signal, price, timestamp, volume)
+
+        print("\n=== Portfolio ===")
+        print(f"Symbols: {len(frames)}/{len(self.traders)}")
+        print(f"Open Positions: {len(self.account['positions'])}")
+        print(f"Free Balance: ₹{self.account['balance']:,.2f}")
+        print(f"Margin In Use: ₹{self.margin_in_use():,.2f}")
+        print(f"Fetch + Indicators: {fetch_time:.2f}s, Cycle: {time.time() - cycle_start:.2f}s")
+        print("=================\n")
+        if METRICS.enabled:
+            METRICS.write(self.config.get('metrics_file', 'metrics.json'))
+        return signals
+
+    def run(self, continuous_mode=True):
+        """Main portfolio loop"""
+        print(f"Starting portfolio paper trading with ₹{self.account['balance']:,.2f}")
+        print(f"Trading {', '.join(self.symbols)} on {self.config['timeframe']} timeframe")
+
+        # Each symbol keeps its own incremental indicator checkpoint
+        checkpoint_dir = self.config.get('indicator_checkpoint_dir', 'indicator_state')
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        for trader in self.traders:
+            trader.indicator_checkpoint = os.path.join(checkpoint_dir, f"{trader.symbol}.npz")
+            trader.load_indicator_engine()
+
+        if not continuous_mode:
+            return self.run_once()
+
+        failures = 0
+        while True:
+            try:
+                self.run_once()
+                failures = 0
+                self.traders[0].wait_for_next_candle()
+            except Exception as e:
+                delay = 60 + backoff_delay(failures, 60, 840)
+                failures += 1
+                print(f"Error occurred: {str(e)}, retrying in {delay:.0f}s")
+                time.sleep(delay)
@@ -0,0 +1,40 @@
+# Portfolio Configuration
+# Runs the conservative strategy across several crypto and NSE symbols on one account
+# Every symbol is quoted in INR, the currency of the shared balance
+
+CONFIG = {
+    'symbols': [
+        'BTC-INR', 'ETH-INR', 'SOL-INR', 'BNB-INR', 'XRP-INR',
+        'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS'
+    ],
+    'timeframe': '1h',        # 1-hour candles
+    'risk_percent': 1,        # Risk per trade, taken from the shared balance
+    'initial_balance': 10000,
+    'max_workers': 16,        # Concurrent data fetches
+    
+    # Technical Parameters
+    'rsi_period': 14,
+    'rsi_overbought': 70,
+    'rsi_oversold': 30,
+    'atr_period': 14,
+    
+    'ema_fast': 50,
+    'ema_slow': 200,
+    'ema_trend': 20,
+    
+    'volume_threshold': 1.5,
+    
+    # Risk Management
+    'profit_target': 2.0,
+    'stop_loss': 1.0,
+    'trailing_stop': True,
+    'trailing_stop_atr': 2.5,
+    
+    # Trade Conditions
+    'min_conditions': 4,
+    
+    # Filters
+    'use_volume_filter': True,
+    'use_trend_filter': True,
+    'use_volatility_filter': True
+}
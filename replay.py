@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS, INTERVAL_SECONDS, BarStore
+from metrics import METRICS
+from trading_bot import AlgoTrader
+
+
+class ReplayClock:
+    """Simulated UTC time that only moves when the replay sets or sleeps it"""
+
+    def __init__(self, start):
+        self.time = BarStore.to_utc(start)
+
+    def now(self):
+        return self.time.to_pydatetime()
+
+    def set(self, timestamp):
+        self.time = BarStore.to_utc(timestamp)
+
+    def sleep(self, seconds):
+        self.time += pd.Timedelta(seconds=seconds)
+
+
+class ReplayDataSource:
+    """Recorded bars served as a live feed would at the clock's time
+
+    Only bars that opened before the clock are visible, whatever end the caller
+    asks for, so a cycle can never see the future.
+    """
+
+    def __init__(self, frames, clock):
+        # frames: {(symbol, interval): DataFrame} or a single DataFrame for any symbol
+        self.frames = frames
+        self.clock = clock
+        self.times = {}
+
+    def frame(self, symbol, interval):
+        df = self.frames if isinstance(self.frames, pd.DataFrame) else self.frames[(symbol, interval)]
+        key = (symbol, interval)
+        if key not in self.times:
+            self.times[key] = df.index.as_unit('ns').asi8
+        return df, self.times[key]
+
+    def get_bars(self, symbol, interval, start, end):
+        df, times = self.frame(symbol, interval)
+        end = min(BarStore.to_utc(end), self.clock.time)
+        first, last = np.searchsorted(times, [BarStore.to_utc(start).value, end.value])
+        return df.iloc[first:last][COLUMNS]
+
+
+class ReplayTrader(AlgoTrader):
+    """AlgoTrader reading the time from a ReplayClock; everything else is the live code"""
+
+    def __init__(self, config, clock, data_source, account=None):
+        self.clock = clock
+        super().__init__(config, data_source, account)
+
+    def now(self):
+        return self.clock.now()
+
+
+class Replay:
+    """Drive the live run_once / execute_trade path over recorded bars
+
+    The clock steps to the close of each bar from start on and one run_once cycle
+    runs per bar, as many per second as the code allows. The account snapshot,
+    journal and indicator checkpoint go to a temporary directory (or directory),
+    so replays are deterministic and never touch the real paper account.
+    """
+
+    def __init__(self, config, frames, start=None, end=None, directory=None, warmup=timedelta(days=30)):
+        self.temp = None
+        if directory is None:
+            self.temp = tempfile.TemporaryDirectory(prefix='replay_')
+            directory = self.temp.name
+        self.directory = directory
+        config = dict(config,
+                      account_file=os.path.join(directory, 'paper_account.json'),
+                      trade_journal=os.path.join(directory, 'trade_journal.jsonl'),
+                      indicator_checkpoint=os.path.join(directory, 'indicator_state.npz'),
+                      metrics_file=os.path.join(directory, 'metrics.json'))
+
+        self.clock = ReplayClock(0)
+        self.data_source = ReplayDataSource(frames, self.clock)
+        df, _ = self.data_source.frame(config['symbol'], config['timeframe'])
+
+        # One cycle per bar close; by default the first cycle sees a full history window,
+        # or every bar when there is less data than that
+        closes = df.index + pd.Timedelta(seconds=INTERVAL_SECONDS[config['timeframe']])
+        if start is None:
+            start = BarStore.to_utc(df.index[0]) + warmup
+            if start > closes[-1]:
+                start = closes[0]
+        start = BarStore.to_utc(start)
+        mask = closes >= start
+        if end is not None:
+            mask &= closes <= BarStore.to_utc(end)
+        self.steps = closes[mask]
+
+        self.trader = ReplayTrader(config, self.clock, self.data_source)
+        self.trader.load_indicator_engine()
+
+    def run(self, cycles=None, quiet=True):
+        """Replay up to cycles bars; returns trades, final account and per-cycle seconds"""
+        steps = self.steps if cycles is None else self.steps[:cycles]
+        timings = np.empty(len(steps))
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as sink, (contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext()):
+            for i, step in enumerate(steps):
+                self.clock.set(step)
+                cycle_start = time.perf_counter()
+                self.trader.run_once()
+                timings[i] = time.perf_counter() - cycle_start
+        seconds = time.perf_counter() - start
+        return {
+            'cycles': len(steps),
+            'seconds': seconds,
+            'cycle_seconds': timings,
+            'trades': list(self.trader.journal.trades()),
+            'account': {key: value for key, value in self.trader.account.items() if key != 'trade_history'}
+        }
+
+    def close(self):
+        if self.temp is not None:
+            self.temp.cleanup()
+
+
+def print_replay(results):
+    timings = results['cycle_seconds']
+    account = results['account']
+    print("\n=== Replay ===")
+    print(f"Cycles: {results['cycles']} in {results['seconds']:.2f}s "
+          f"({results['cycles'] / results['seconds'] if results['seconds'] else 0:,.0f}/s)")
+    if len(timings):
+        p50, p99 = np.percentile(timings, [50, 99]) * 1000
+        print(f"Cycle: p50={p50:.3f}ms p99={p99:.3f}ms max={timings.max() * 1000:.3f}ms")
+    print(f"Trades: {len(results['trades'])}")
+    print(f"Final Balance: ₹{account['balance']:,.2f}")
+    print(f"Open Positions: {len(account['positions'])}")
+    print("==============\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded bars through the live trading loop')
+    parser.add_argument('profile', nargs='?', default='conservative', help='config module, e.g. conservative')
+    parser.add_argument('--cache-dir', default='data_cache', help='bar cache to replay from')
+    parser.add_argument('--archive', help='replay from a memory-mapped bar archive directory (see archive.py)')
+    parser.add_argument('--synthetic', type=int, help='replay this many synthetic bars instead of the cache')
+    parser.add_argument('--start', help='first bar close to replay (default: 30 days into the data)')
+    parser.add_argument('--end', help='last bar close to replay')
+    parser.add_argument('--trades-out', help='write the replayed trades as JSON Lines, e.g. to diff against a golden run')
+    parser.add_argument('--verbose', action='store_true', help='show the trader output of every cycle')
+    parser.add_argument('--stages', action='store_true', help='break the cycle cost down by stage')
+    args = parser.parse_args()
+    if args.stages:
+        METRICS.enable()
+
+    CONFIG = importlib.import_module(f"{args.profile}_config").CONFIG
+    if args.synthetic:
+        from synthetic_data import generate_ohlcv
+        df = generate_ohlcv(args.synthetic, CONFIG['timeframe'], seed=0)
+    elif args.archive:
+        from archive import BarArchive
+        df = BarArchive(args.archive).frame(CONFIG['symbol'], CONFIG['timeframe'], args.start and
+                                            pd.Timestamp(args.start) - timedelta(days=30), args.end)
+        if df.empty:
+            parser.error(f"No archived {CONFIG['symbol']} {CONFIG['timeframe']} bars in {args.archive}")
+    else:
+        df = BarStore(args.cache_dir).read(CONFIG['symbol'], CONFIG['timeframe'])
+        if df.empty:
+            parser.error(f"No cached {CONFIG['symbol']} {CONFIG['timeframe']} bars in {args.cache_dir}")
+
+    replay = Replay(CONFIG, df, args.start, args.end)
+    try:
+        results = replay.run(quiet=not args.verbose)
+    finally:
+        replay.close()
+    print_replay(results)
+    if args.stages:
+        METRICS.print_report()
+    if args.trades_out:
+        with open(args.trades_out, 'w') as f:
+            for trade in results['trades']:
+                f.write(json.dumps(trade) + '\n')
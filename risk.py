@@ -0,0 +1,153 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+FIXED = 'fixed'
+ATR = 'atr'
+
+
+def bar_time(timestamp):
+    """Bar timestamp as epoch nanoseconds; naive values are taken as UTC, like BarStore.to_utc"""
+    return int(pd.Timestamp(timestamp).value)
+
+
+class RiskEngine:
+    """Position sizing, portfolio limits and trailing stops
+
+    Sizing is FIXED (margin is risk_percent of the balance) or ATR: the size whose
+    leveraged loss at atr_stop_multiple ATRs below the entry is risk_percent of the
+    balance. A new position is then shrunk to fit the limits over every open
+    position of the account. Trailing stops live on the position itself and only
+    fold in the bars they have not seen, so a cycle is one vectorized pass over
+    all open positions instead of a rescan of recent highs per symbol.
+    """
+
+    def __init__(self, risk_percent, leverage=1, stop_loss=1.0, sizing=FIXED, stop_atr=2.0,
+                 trailing_stop=False, trailing_atr=None, max_positions=None, max_exposure=None,
+                 max_margin_pct=None):
+        if sizing not in (FIXED, ATR):
+            raise ValueError(f"Unknown position_sizing {sizing!r}, expected {FIXED!r} or {ATR!r}")
+        self.risk_fraction = risk_percent / 100
+        self.leverage = leverage
+        self.stop_loss = stop_loss
+        self.sizing = sizing
+        self.stop_atr = stop_atr
+        self.trailing_stop = trailing_stop
+        self.trailing_atr = trailing_atr
+        self.max_positions = max_positions
+        self.max_exposure = max_exposure
+        self.max_margin_pct = max_margin_pct
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from the strategy config; sizing defaults to FIXED and every limit to none"""
+        return cls(
+            config['risk_percent'],
+            leverage=config.get('leverage', 1),
+            stop_loss=config['stop_loss'],
+            sizing=config.get('position_sizing', FIXED),
+            stop_atr=config.get('atr_stop_multiple', config.get('trailing_stop_atr') or 2.0),
+            trailing_stop=config.get('trailing_stop', False),
+            trailing_atr=config.get('trailing_stop_atr'),
+            max_positions=config.get('max_positions'),
+            max_exposure=config.get('max_exposure'),
+            max_margin_pct=config.get('max_margin_pct')
+        )
+
+    def stop_size(self, balance, entry_price, stop_price):
+        """Size whose loss at stop_price, multiplied by the leverage like every P&L, is the risk amount"""
+        return balance * self.risk_fraction / ((entry_price - stop_price) * self.leverage)
+
+    def size_factor(self, price, atr=np.nan):
+        """Position size per unit of balance; works on scalars and whole arrays of bars
+
+        ATR sizing falls back to the stop_loss percentage while the ATR is still warming up.
+        """
+        if self.sizing == FIXED:
+            return self.risk_fraction * self.leverage / price
+        distance = np.where(np.asarray(atr) > 0, self.stop_atr * np.asarray(atr), price * self.stop_loss / 100)
+        return self.stop_size(1.0, price, price - distance)
+
+    def limit_size(self, account, price, size):
+        """Shrink a new position to the room left under the portfolio limits; 0 when there is none
+
+        Exposure is the leveraged notional at entry prices as a multiple of equity
+        (free balance plus posted margin), since execute_trade multiplies every P&L
+        by the leverage.
+        """
+        positions = account['positions'].values()
+        if self.max_positions is not None and len(positions) >= self.max_positions:
+            return 0.0
+        margin = sum(position['margin'] for position in positions)
+        equity = account['balance'] + margin
+        if self.max_exposure is not None:
+            exposure = sum(p['size'] * p['entry_price'] * p.get('leverage', 1) for p in positions)
+            size = min(size, (self.max_exposure * equity - exposure) / (price * self.leverage))
+        if self.max_margin_pct is not None:
+            size = min(size, (self.max_margin_pct / 100 * equity - margin) * self.leverage / price)
+        return max(size, 0.0)
+
+    def trail(self, highest, atr):
+        """Stop level under the highest price: trailing_stop_atr ATRs, else stop_loss percent
+
+        An ATR that is still warming up (zero) gives no level rather than a stop at the high.
+        """
+        if self.trailing_atr is None:
+            return highest * (1 - self.stop_loss / 100)
+        atr = np.asarray(atr, dtype=float)
+        return np.where(atr > 0, highest - self.trailing_atr * atr, np.nan)
+
+    def trail_level(self, highest, atr):
+        """trail() for one bar, without NumPy call overhead"""
+        if self.trailing_atr is None:
+            return highest * (1 - self.stop_loss / 100)
+        return highest - self.trailing_atr * atr if atr > 0 else math.nan
+
+    def open_trail(self, position, price, atr, timestamp):
+        """Start a new position's trailing stop at the entry bar's close"""
+        if not self.trailing_stop:
+            return
+        stop = float(self.trail(price, atr))
+        position['highest'] = price
+        position['trailing_stop'] = None if np.isnan(stop) else stop
+        position['trail_time'] = bar_time(timestamp)
+
+    def update_trailing_stops(self, positions, frames):
+        """Fold each position's unseen bars into its trailing stop, all positions at once
+
+        positions: {symbol: position}; frames: {symbol: DataFrame with High, Close and
+        atr}. Only bars after the position's trail_time are read, and several missed
+        bars fold in as one (their highest high and the latest ATR). The stop only
+        ratchets up. Returns {symbol: True if the latest close is at or below the stop}.
+        """
+        symbols = [symbol for symbol in positions if symbol in frames]
+        n = len(symbols)
+        highest = np.empty(n)
+        stop = np.empty(n)
+        close = np.empty(n)
+        high = np.full(n, np.nan)
+        atr = np.full(n, np.nan)
+        for k, symbol in enumerate(symbols):
+            position = positions[symbol]
+            df = frames[symbol]
+            times = df.index.as_unit('ns').asi8
+            if position.get('trail_time') is None:
+                # Positions opened before trailing state existed start from their entry and the latest bar
+                first = len(times) - 1
+            else:
+                first = np.searchsorted(times, position['trail_time'], side='right')
+            highest[k] = position.get('highest', position['entry_price'])
+            stop[k] = np.nan if position.get('trailing_stop') is None else position['trailing_stop']
+            close[k] = df['Close'].iloc[-1]
+            if first < len(times):
+                high[k] = df['High'].iloc[first:].max()
+                atr[k] = df['atr'].iloc[-1]
+                position['trail_time'] = int(times[-1])
+
+        highest = np.fmax(highest, high)
+        stop = np.fmax(stop, self.trail(highest, atr))
+        for symbol, h, s in zip(symbols, highest.tolist(), stop.tolist()):
+            positions[symbol]['highest'] = h
+            positions[symbol]['trailing_stop'] = None if np.isnan(s) else s
+        return dict(zip(symbols, (close <= stop).tolist()))
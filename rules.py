@@ -0,0 +1,249 @@
+import ast
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bar_window import BAR_COLUMNS, indicator_columns
+
+# Sell when any of these fires
+DEFAULT_EXIT_RULES = ['rsi > rsi_overbought', 'Close < ema_fast']
+
+
+def default_entry_rules(config):
+    """The four classic entry conditions; a use_*_filter key makes its condition mandatory"""
+    trend = 'Close > ema_fast and ema_fast > ema_slow'
+    if config.get('trend_timeframe'):
+        # Only with the higher-timeframe trend
+        trend += ' and Close > ema_trend'
+    return [
+        {'name': 'trend', 'rule': trend, 'required': config.get('use_trend_filter', False)},
+        {'name': 'momentum', 'rule': 'rsi < rsi_oversold or macd > macd_signal'},
+        {'name': 'volume', 'rule': 'volume_ratio > volume_threshold',
+         'required': config.get('use_volume_filter', False)},
+        {'name': 'volatility', 'rule': 'Close > bb_middle and atr < mean(atr, 10)',
+         'required': config.get('use_volatility_filter', False)}
+    ]
+
+
+def rolling(values, window, reduce):
+    """Trailing window reduction, NaN until the window is full (like pandas rolling)"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = reduce(sliding_window_view(values, window), axis=1)
+    return out
+
+
+def shift(values, periods):
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+# name: (implementation, bars of history the result needs beyond the argument's own)
+FUNCTIONS = {
+    'mean': (lambda values, n: rolling(values, n, np.mean), lambda n: n - 1),
+    'max': (lambda values, n: rolling(values, n, np.max), lambda n: n - 1),
+    'min': (lambda values, n: rolling(values, n, np.min), lambda n: n - 1),
+    'prev': (shift, lambda n: n),
+    'abs': (lambda values: np.abs(values), None)
+}
+
+COMPARISONS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal
+}
+
+ARITHMETIC = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide
+}
+
+
+class Expression:
+    """A rule compiled into nested closures over NumPy column arrays
+
+    Names resolve at compile time to an indicator column or a numeric config
+    value, so evaluating a rule is only a handful of array operations.
+    """
+
+    def __init__(self, text, names):
+        self.text = text
+        self.names = names
+        self.columns = set()
+        try:
+            tree = ast.parse(text, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid rule {text!r}: {e.msg}")
+        self.evaluate, self.lookback = self.compile(tree.body)
+
+    def compile(self, node):
+        """Return (fn(columns) -> array or scalar, bars of history needed)"""
+        if isinstance(node, ast.BoolOp):
+            parts = [self.compile(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            fns = [fn for fn, _ in parts]
+
+            def boolean(columns):
+                result = fns[0](columns)
+                for fn in fns[1:]:
+                    result = combine(result, fn(columns))
+                return result
+            return boolean, max(lookback for _, lookback in parts)
+
+        if isinstance(node, ast.Compare):
+            parts = [self.compile(node.left)] + [self.compile(value) for value in node.comparators]
+            ops = []
+            for op in node.ops:
+                if type(op) not in COMPARISONS:
+                    raise ValueError(f"Unsupported comparison in rule {self.text!r}")
+                ops.append(COMPARISONS[type(op)])
+            fns = [fn for fn, _ in parts]
+
+            def compare(columns):
+                # a < b < c means a < b and b < c
+                left = fns[0](columns)
+                result = True
+                for op, fn in zip(ops, fns[1:]):
+                    right = fn(columns)
+                    result = np.logical_and(result, op(left, right))
+                    left = right
+                return result
+            return compare, max(lookback for _, lookback in parts)
+
+        if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+            op = ARITHMETIC[type(node.op)]
+            (left, left_lookback), (right, right_lookback) = self.compile(node.left), self.compile(node.right)
+            return lambda columns: op(left(columns), right(columns)), max(left_lookback, right_lookback)
+
+        if isinstance(node, ast.UnaryOp):
+            operand, lookback = self.compile(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda columns: np.logical_not(operand(columns)), lookback
+            if isinstance(node.op, ast.USub):
+                return lambda columns: np.negative(operand(columns)), lookback
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            function, extra = FUNCTIONS[node.func.id]
+            if not node.args:
+                raise ValueError(f"{node.func.id}() needs an argument in rule {self.text!r}")
+            argument, lookback = self.compile(node.args[0])
+            if extra is None:
+                return lambda columns: function(argument(columns)), lookback
+            if len(node.args) == 2 and isinstance(node.args[1], ast.Constant) and isinstance(node.args[1].value, int):
+                n = node.args[1].value
+            elif len(node.args) == 1 and node.func.id == 'prev':
+                n = 1
+            else:
+                raise ValueError(f"{node.func.id}() needs a whole number of bars in rule {self.text!r}")
+            return lambda columns: function(np.asarray(argument(columns), dtype=float), n), lookback + extra(n)
+
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                raise ValueError(f"Unknown name {node.id!r} in rule {self.text!r}")
+            kind, value = self.names[node.id]
+            if kind == 'column':
+                self.columns.add(value)
+                return (lambda columns: columns[value]), 0
+            return (lambda columns: value), 0
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            value = node.value
+            return (lambda columns: value), 0
+
+        raise ValueError(f"Unsupported expression {ast.unparse(node)!r} in rule {self.text!r}")
+
+
+class RuleSet:
+    """Entry and exit rules from a config, compiled once and evaluated on NumPy arrays
+
+    Each entry rule that passes adds its weight to the bar's score; a buy needs a
+    score of at least min_conditions and every required rule to pass. Any exit
+    rule firing sells. Rules are Python-like expressions over indicator columns,
+    config values and mean/max/min/prev(x, n), abs(x), e.g.
+
+        {'name': 'trend', 'rule': 'Close > ema_fast and ema_fast > ema_slow', 'weight': 1}
+    """
+
+    def __init__(self, entry_rules, exit_rules, min_conditions, names):
+        self.min_conditions = min_conditions
+        self.entry = []
+        for rule in entry_rules:
+            if isinstance(rule, str):
+                rule = {'rule': rule}
+            self.entry.append({
+                'name': rule.get('name', rule['rule']),
+                'expression': Expression(rule['rule'], names),
+                'weight': rule.get('weight', 1),
+                'required': bool(rule.get('required', False))
+            })
+        self.exit = [Expression(rule, names) for rule in exit_rules]
+        expressions = [rule['expression'] for rule in self.entry] + self.exit
+        self.lookback = max([expression.lookback for expression in expressions], default=0)
+        self.columns = sorted(set().union(*[expression.columns for expression in expressions]))
+
+    @classmethod
+    def from_config(cls, config):
+        """Compile config['entry_rules'] / config['exit_rules'], or the default strategy
+
+        Only a missing (None) rule list falls back to the defaults; an empty
+        exit_rules list means no rule-based exits, leaving the stops.
+        """
+        names = {name: ('column', name) for name in BAR_COLUMNS + indicator_columns(config)}
+        names['ema_fast'] = ('column', f"ema_{config['ema_fast']}")
+        names['ema_slow'] = ('column', f"ema_{config['ema_slow']}")
+        # Any other numeric config value can be used as a threshold
+        for key, value in config.items():
+            if key not in names and isinstance(value, (int, float)) and not isinstance(value, bool):
+                names[key] = ('constant', value)
+        entry_rules = config.get('entry_rules')
+        exit_rules = config.get('exit_rules')
+        return cls(entry_rules if entry_rules is not None else default_entry_rules(config),
+                   exit_rules if exit_rules is not None else DEFAULT_EXIT_RULES,
+                   config['min_conditions'], names)
+
+    def arrays(self, df, last=False):
+        """The columns the rules read, as float arrays; only the needed tail when last is set"""
+        n = self.lookback + 1
+        columns = {}
+        for name in self.columns:
+            values = df[name].to_numpy(dtype=float)
+            columns[name] = values[-n:] if last else values
+        return columns
+
+    def evaluate(self, df, last=False):
+        """Score, entry and exit flags for every bar of df, or for its last bar only
+
+        Returns a dict of arrays; with last=True each holds a single value and
+        only the last lookback + 1 rows are touched.
+        """
+        columns = self.arrays(df, last)
+        rows = len(columns[self.columns[0]]) if self.columns else 1
+        n = 1 if last else len(df)
+
+        def flags(expression):
+            # Rules over constants give a scalar; only the last n rows are wanted
+            return np.broadcast_to(expression.evaluate(columns), (rows,))[rows - n:]
+
+        score = np.zeros(n)
+        required = np.ones(n, dtype=bool)
+        exits = np.zeros(n, dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for rule in self.entry:
+                passed = flags(rule['expression'])
+                score += rule['weight'] * passed
+                if rule['required']:
+                    required &= passed
+            for expression in self.exit:
+                exits |= flags(expression)
+        return {
+            'score': score,
+            'entries': required & (score >= self.min_conditions),
+            'exits': exits
+        }
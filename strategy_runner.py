@@ -0,0 +1,159 @@
+import argparse
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backtester import Backtester
+from bar_store import INTERVAL_SECONDS, bucket_origin, resample_bars
+from data_client import backoff_delay
+from metrics import METRICS
+from trading_bot import AlgoTrader
+
+
+class StrategyRunner:
+    """Run several strategy configs side by side, each on its own paper account
+
+    Strategies on the same symbol form a group that downloads bars once per
+    cycle, at the group's finest timeframe; coarser timeframes are rolled up
+    from those bars (resample_bars) instead of downloaded. A group shares one
+    indicator cache keyed by symbol, timeframe, indicator and parameters, so
+    e.g. an ATR with the same period on the same bars is computed once for all
+    of them. Groups are fetched concurrently in a thread pool; signals and
+    trades then run in a plain sequential loop over the strategies, all on the
+    same latest bar.
+    """
+
+    def __init__(self, strategies, data_source=None, max_workers=None):
+        self.traders = {}
+        for name, config in strategies.items():
+            # Separate account snapshot and journal per strategy unless the config names them
+            config = dict(config, name=name)
+            config.setdefault('account_file', f"{name}_account.json")
+            config.setdefault('trade_journal', f"{name}_journal.jsonl")
+            trader = AlgoTrader(config, data_source)
+            # Every strategy reads bars through the first one's source (and its local cache)
+            data_source = trader.data_source
+            self.traders[name] = trader
+
+        # Finest timeframe first: its bars are the ones downloaded
+        self.groups = {}
+        for trader in self.traders.values():
+            self.groups.setdefault(trader.symbol, []).append(trader)
+        for traders in self.groups.values():
+            traders.sort(key=lambda trader: INTERVAL_SECONDS[trader.timeframe])
+        self.max_workers = max_workers or min(32, len(self.groups))
+
+    @classmethod
+    def from_profiles(cls, profiles, data_source=None):
+        """Runner over <profile>_config.py modules, e.g. ['conservative', 'aggressive']"""
+        return cls({profile: importlib.import_module(f"{profile}_config").CONFIG for profile in profiles},
+                   data_source)
+
+    @staticmethod
+    def bars(traders, df):
+        """Bars for every timeframe of a group, rolled up from its finest timeframe's bars"""
+        frames = {traders[0].timeframe: df}
+        for trader in traders[1:]:
+            if trader.timeframe not in frames:
+                bars = resample_bars(df, trader.timeframe, bucket_origin(trader.symbol))
+                # The first coarse bar only holds the tail of its interval
+                frames[trader.timeframe] = bars[bars.index >= df.index[0]]
+        return frames
+
+    def prepare(self, traders):
+        """Fetch one group's bars and compute every strategy's indicators (runs in a worker thread)"""
+        with METRICS.stage('fetch'):
+            df = traders[0].get_historical_data()
+        METRICS.count('rows_fetched', len(df))
+        frames = self.bars(traders, df)
+        cache = {}
+        with METRICS.stage('indicators'):
+            return [(trader, trader.calculate_indicators(frames[trader.timeframe], cache)) for trader in traders]
+
+    def run_once(self):
+        """Run one cycle: concurrent fetch and indicators per group, then every strategy's signals"""
+        cycle_start = time.time()
+        print(f"\nFetching market data for {len(self.groups)} symbols...")
+        frames = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [(symbol, pool.submit(self.prepare, traders)) for symbol, traders in self.groups.items()]
+            for symbol, future in futures:
+                try:
+                    frames.extend(future.result())
+                except Exception as e:
+                    print(f"Error fetching {symbol}: {str(e)}")
+        fetch_time = time.time() - cycle_start
+
+        signals = {}
+        for trader, df in frames:
+            name = trader.config['name']
+            print(f"\n--- {name} ---")
+            trader.df = trader.generate_signals(df)
+            signal = int(df['signal'].iloc[-1])
+            if signal != 0:
+                print(f"{name} signal detected: {'BUY' if signal == 1 else 'SELL'}")
+                trader.execute_trade(signal, float(df['Close'].iloc[-1]), df.index[-1],
+                                     float(df['Volume'].iloc[-1]))
+            signals[name] = signal
+
+        self.print_status(fetch_time, time.time() - cycle_start)
+        if METRICS.enabled:
+            METRICS.write(next(iter(self.traders.values())).config.get('metrics_file', 'metrics.json'))
+        return signals
+
+    def print_status(self, fetch_time, cycle_time):
+        print("\n=== Strategies ===")
+        print(f"{'strategy':<16}{'symbol':<12}{'balance':>14}{'open':>6}{'trades':>8}{'win %':>8}")
+        for name, trader in self.traders.items():
+            account = trader.account
+            summary = account['summary']
+            print(f"{name:<16}{trader.symbol:<12}{account['balance']:>14,.2f}{len(account['positions']):>6}"
+                  f"{summary['total_trades']:>8}{summary['win_rate']:>8.1f}")
+        print(f"Fetch + Indicators: {fetch_time:.2f}s, Cycle: {cycle_time:.2f}s")
+        print("==================\n")
+
+    def backtest(self):
+        """Backtest every strategy over its group's history, sharing downloads and indicators"""
+        results = {}
+        for traders in self.groups.values():
+            frames = self.bars(traders, traders[0].get_historical_data())
+            cache = {}
+            for trader in traders:
+                backtester = Backtester(trader.config)
+                results[trader.config['name']] = (backtester, backtester.backtest(frames[trader.timeframe], cache))
+        return results
+
+    def run(self, continuous_mode=True):
+        """Main loop over all strategies"""
+        print(f"Starting {len(self.traders)} strategies: {', '.join(self.traders)}")
+        if not continuous_mode:
+            return self.run_once()
+
+        failures = 0
+        while True:
+            try:
+                self.run_once()
+                failures = 0
+                next(iter(self.traders.values())).wait_for_next_candle()
+            except Exception as e:
+                delay = 60 + backoff_delay(failures, 60, 840)
+                failures += 1
+                print(f"Error occurred: {str(e)}, retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Paper trade several strategy profiles side by side')
+    parser.add_argument('profiles', nargs='*', default=['conservative', 'aggressive'],
+                        help='config modules to load, e.g. conservative for conservative_config.py')
+    parser.add_argument('--once', action='store_true', help='run a single cycle and exit')
+    parser.add_argument('--backtest', action='store_true', help='backtest the profiles instead of paper trading')
+    args = parser.parse_args()
+
+    runner = StrategyRunner.from_profiles(args.profiles)
+    if args.backtest:
+        for name, (backtester, results) in runner.backtest().items():
+            print(f"Strategy: {name}")
+            backtester.print_results(results)
+    else:
+        runner.run(continuous_mode=not args.once)
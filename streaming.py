@@ -0,0 +1,228 @@
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS, INTERVAL_SECONDS, BarStore, bucket_origin
+from trading_bot import AlgoTrader
+
+
+def bars_to_ticks(df):
+    """Expand OHLCV bars into open/high/low/close ticks for replay"""
+    times = df.index.tz_convert('UTC').as_unit('ns').asi8 / 1e9
+    ticks = []
+    for t, o, h, l, c, v in zip(times, *(df[col].to_numpy(dtype=float) for col in COLUMNS)):
+        # Touch the extreme nearer the open first, like a typical intrabar path
+        path = (o, h, l, c) if abs(h - o) < abs(o - l) else (o, l, h, c)
+        for offset, price in enumerate(path):
+            ticks.append({'time': t + offset, 'price': price, 'volume': v / 4})
+    return ticks
+
+
+class ReplayFeed:
+    """Replay ticks from a JSON Lines file or a list, optionally paced in real time"""
+
+    def __init__(self, source, speed=None):
+        # source: path to a .jsonl file of {"time", "price", "volume"} or a list of tick dicts
+        self.source = source
+        self.speed = speed
+
+    async def ticks(self):
+        if isinstance(self.source, str):
+            with open(self.source, 'r') as f:
+                ticks = [json.loads(line) for line in f if line.strip()]
+        else:
+            ticks = self.source
+
+        previous = None
+        for tick in ticks:
+            if self.speed and previous is not None:
+                await asyncio.sleep(max(0.0, (tick['time'] - previous) / self.speed))
+            previous = tick['time']
+            yield dict(tick, received=time.perf_counter())
+            # Let the consumer run between ticks, as a real socket would
+            await asyncio.sleep(0)
+
+
+class SocketFeed:
+    """Read JSON Lines ticks from a TCP socket"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def ticks(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                tick = json.loads(line)
+                tick['received'] = received
+                yield tick
+        finally:
+            writer.close()
+
+
+class StreamingTrader(AlgoTrader):
+    """React to every tick: stops and targets per tick, indicator signals per candle close
+
+    Indicators resume from the checkpoint like run() does, and warm_up() tops
+    them up with recent bars from the data source. Until the engine has seen
+    enough bars for its slowest indicator, candle closes only update state.
+    """
+
+    def __init__(self, config, data_source=None, account=None):
+        super().__init__(config, data_source, account)
+        self.interval = INTERVAL_SECONDS[self.timeframe]
+        # Candles start where bar_store.bucket_starts puts the data source's bars, e.g. 09:15 IST for NSE
+        self.origin = bucket_origin(self.symbol) // 1_000_000_000 if self.timeframe != '1d' else 0
+        self.load_indicator_engine()
+        self.candles = deque(maxlen=self.indicator_engine.history)
+        self.candle = None
+        self.latencies = []
+
+    def warm_up(self):
+        """Seed indicators and candles from the checkpoint plus recent bars, as run() does"""
+        df = self.calculate_indicators(self.get_historical_data())
+        for timestamp, row in zip(df.index, df[COLUMNS].itertuples(index=False)):
+            timestamp = BarStore.to_utc(timestamp)
+            self.candles.append([int(timestamp.timestamp()), timestamp, *map(float, row)])
+        # The newest bar may still be forming; ticks in its interval continue it
+        self.candle = self.candles[-1] if self.candles else None
+        print(f"Indicators warmed up to {self.indicator_engine.last_timestamp} "
+              f"({self.indicator_engine.bars_seen} bars)")
+
+    def on_tick(self, tick):
+        """Update the forming candle and indicators, then decide"""
+        price = float(tick['price'])
+        volume = float(tick.get('volume', 0.0))
+        bucket = int(self.origin + (tick['time'] - self.origin) // self.interval * self.interval)
+
+        if self.candle is None or bucket != self.candle[0]:
+            if self.candle is not None:
+                self.on_candle_close()
+            timestamp = pd.Timestamp(bucket, unit='s', tz='UTC')
+            self.candle = [bucket, timestamp, price, price, price, price, volume]
+            self.candles.append(self.candle)
+        else:
+            candle = self.candle
+            candle[3] = max(candle[3], price)
+            candle[4] = min(candle[4], price)
+            candle[5] = price
+            candle[6] += volume
+
+        _, timestamp, _, high, low, close, volume = self.candle
+        self.indicator_engine.update(timestamp, high, low, close, volume)
+
+        if self.symbol in self.account['positions'] and self.check_tick_exit(price):
+            self.execute_trade(-1, price, pd.Timestamp(tick['time'], unit='s', tz='UTC'))
+
+    def check_tick_exit(self, price):
+        """Profit target, stop loss and trailing stop on the latest tick price"""
+        position = self.account['positions'][self.symbol]
+        entry_price = position['entry_price']
+        if ((price - entry_price) / entry_price) * 100 >= self.config['profit_target']:
+            return True
+        loss_pct = ((entry_price - price) / entry_price) * 100
+        if loss_pct >= self.config['stop_loss']:
+            return True
+        # The trailing stop level moves on candle closes (check_stop_loss); ticks only test it
+        stop = position.get('trailing_stop')
+        return self.config['trailing_stop'] and stop is not None and price <= stop
+
+    def recent_frame(self):
+        """The retained candles as a DataFrame with indicator columns"""
+        df = pd.DataFrame(
+            [candle[2:] for candle in self.candles],
+            index=pd.DatetimeIndex([candle[1] for candle in self.candles]),
+            columns=COLUMNS
+        )
+        return self.indicator_engine.apply(df)
+
+    def on_candle_close(self):
+        """Run the regular signal rules on the candle that just closed"""
+        engine = self.indicator_engine
+        engine.save(self.indicator_checkpoint)
+        if engine.bars_seen < engine.warmup_bars():
+            print(f"Warming up indicators: {engine.bars_seen}/{engine.warmup_bars()} bars")
+            return
+        self.df = self.generate_signals(self.recent_frame())
+        signal = self.df['signal'].iloc[-1]
+        if signal != 0:
+            print(f"Signal detected: {'BUY' if signal == 1 else 'SELL'}")
+            self.execute_trade(signal, float(self.df['Close'].iloc[-1]), self.df.index[-1])
+
+    async def run_stream(self, feed, queue_size=10000, warm_up=True):
+        """Consume a feed through an asyncio queue until it ends"""
+        if warm_up:
+            try:
+                self.warm_up()
+            except Exception as e:
+                print(f"Could not warm up indicators ({str(e)}), waiting for live candles")
+        queue = asyncio.Queue(maxsize=queue_size)
+
+        async def produce():
+            async for tick in feed.ticks():
+                await queue.put(tick)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        while True:
+            tick = await queue.get()
+            if tick is None:
+                break
+            self.on_tick(tick)
+            self.latencies.append((time.perf_counter() - tick['received']) * 1000)
+        await producer
+        self.print_latency_report()
+        return self.latency_stats()
+
+    def latency_stats(self):
+        """Tick-to-decision latency percentiles in milliseconds"""
+        if not self.latencies:
+            return {}
+        latencies = np.array(self.latencies)
+        return {
+            'ticks': len(latencies),
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max())
+        }
+
+    def print_latency_report(self):
+        stats = self.latency_stats()
+        if not stats:
+            return
+        print("\n=== Tick-to-Decision Latency ===")
+        print(f"Ticks: {stats['ticks']}")
+        print(f"Mean: {stats['mean_ms']:.3f} ms")
+        print(f"p50: {stats['p50_ms']:.3f} ms, p95: {stats['p95_ms']:.3f} ms, p99: {stats['p99_ms']:.3f} ms")
+        print(f"Max: {stats['max_ms']:.3f} ms")
+        print("================================\n")
+
+
+if __name__ == '__main__':
+    # Usage: python streaming.py ticks.jsonl [conservative|aggressive]
+    #        python streaming.py host:port [conservative|aggressive]
+    target = sys.argv[1]
+    profile = sys.argv[2] if len(sys.argv) > 2 else 'aggressive'
+    if profile == 'aggressive':
+        from aggressive_config import CONFIG
+    else:
+        from conservative_config import CONFIG
+
+    if target.endswith('.jsonl'):
+        feed = ReplayFeed(target)
+    else:
+        host, port = target.rsplit(':', 1)
+        feed = SocketFeed(host, int(port))
+    asyncio.run(StreamingTrader(CONFIG).run_stream(feed))
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+INTERVAL_FREQ = {
+    '1m': '1min',
+    '5m': '5min',
+    '15m': '15min',
+    '30m': '30min',
+    '1h': '1h',
+    '4h': '4h',
+    '1d': '1D'
+}
+
+
+def generate_ohlcv(n_bars, interval='1m', start_price=5_000_000.0, drift=0.0, volatility=0.001,
+                   jump_intensity=0.0, jump_mean=0.0, jump_std=0.0, seed=None,
+                   start='2024-01-01', tz='UTC'):
+    """Synthetic OHLCV bars from geometric Brownian motion with optional Merton jumps
+
+    volatility and drift are per bar; jump_intensity is the expected number of jumps
+    per bar and jump sizes are normal in log space.
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(drift - 0.5 * volatility ** 2, volatility, n_bars)
+    if jump_intensity > 0:
+        jumps = rng.poisson(jump_intensity, n_bars)
+        log_returns += jumps * jump_mean + np.sqrt(jumps) * jump_std * rng.standard_normal(n_bars)
+
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+
+    # Intrabar excursions beyond the open/close range scale with volatility
+    wick = np.abs(rng.standard_normal((2, n_bars))) * volatility * 0.5
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+
+    # Volume is heavier on large moves
+    volume = rng.lognormal(3.0, 0.75, n_bars) * (1 + np.abs(log_returns) / volatility)
+
+    index = pd.date_range(start=start, periods=n_bars, freq=INTERVAL_FREQ[interval], tz=tz)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)
+
+
+def generate_universe(symbols, n_bars, interval='1m', seed=0, **kwargs):
+    """Independent synthetic series for several symbols, keyed like FrameSource expects"""
+    frames = {}
+    for i, symbol in enumerate(symbols):
+        frames[(symbol, interval)] = generate_ohlcv(n_bars, interval, seed=seed + i, **kwargs)
+    return frames
+
+
+class ChartServer:
+    """Local HTTP stand-in for Yahoo's chart API serving in-memory bars
+
+    frames maps symbol to an OHLCV DataFrame. Failures can be injected: each
+    request fails with a 503 with probability failure_rate, and more than
+    max_rate requests per second get a 429, like Yahoo's throttling. latency
+    adds a fixed delay per request.
+    """
+
+    def __init__(self, frames, failure_rate=0.0, max_rate=None, latency=0.0, seed=None):
+        self.frames = frames
+        self.failure_rate = failure_rate
+        self.max_rate = max_rate
+        self.latency = latency
+        self.random = np.random.default_rng(seed)
+        self.requests = 0
+        self.window = []
+        self.server = None
+
+    def start(self, port=0):
+        """Serve from a daemon thread; returns the base URL for YahooChartSource"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlsplit
+        import json
+        import time
+
+        stand_in = self
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                symbol = url.path.rsplit('/', 1)[-1]
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with lock:
+                    stand_in.requests += 1
+                    now = time.monotonic()
+                    stand_in.window = [t for t in stand_in.window if now - t < 1.0] + [now]
+                    throttled = stand_in.max_rate is not None and len(stand_in.window) > stand_in.max_rate
+                    failed = stand_in.random.random() < stand_in.failure_rate
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                if throttled:
+                    return self.reply(429, headers={'Retry-After': '1'})
+                if failed:
+                    return self.reply(503)
+                if symbol not in stand_in.frames:
+                    return self.reply(404)
+
+                df = stand_in.frames[symbol]
+                index = df.index if df.index.tz is not None else df.index.tz_localize('UTC')
+                stamps = index.as_unit('s').asi8
+                rows = (stamps >= int(query['period1'])) & (stamps < int(query['period2']))
+                body = json.dumps({'chart': {'error': None, 'result': [{
+                    'meta': {'symbol': symbol, 'exchangeTimezoneName': str(df.index.tz or 'UTC')},
+                    'timestamp': stamps[rows].tolist(),
+                    'indicators': {'quote': [{column.lower(): df[column].to_numpy()[rows].tolist()
+                                              for column in ['Open', 'High', 'Low', 'Close', 'Volume']}]}
+                }]}}).encode()
+                self.reply(200, body, {'Content-Type': 'application/json'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v8/finance/chart/"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+async def serve_ticks(ticks, host='127.0.0.1', port=0):
+    """Local stand-in tick server for streaming.SocketFeed: sends every tick to each client that connects"""
+    import asyncio
+    import json
+
+    async def handle(reader, writer):
+        for tick in ticks:
+            writer.write((json.dumps(tick) + '\n').encode())
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
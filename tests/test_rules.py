@@ -0,0 +1,21 @@
+from conservative_config import CONFIG
+from rules import DEFAULT_EXIT_RULES, RuleSet
+from synthetic_data import generate_ohlcv
+from trading_bot import AlgoTrader
+
+
+def test_empty_exit_rules_disable_rule_exits(tmp_path):
+    config = dict(CONFIG, exit_rules=[], account_file=str(tmp_path / 'account.json'),
+                  trade_journal=str(tmp_path / 'journal.jsonl'))
+    rules = RuleSet.from_config(config)
+    assert rules.exit == []
+
+    df = AlgoTrader(config).calculate_indicators(generate_ohlcv(500, '1h', seed=1))
+    assert not rules.evaluate(df)['exits'].any()
+    assert not rules.evaluate(df, last=True)['exits'].any()
+
+
+def test_missing_exit_rules_use_defaults():
+    rules = RuleSet.from_config(dict(CONFIG, exit_rules=None))
+    assert len(rules.exit) == len(DEFAULT_EXIT_RULES)
+    assert len(RuleSet.from_config(CONFIG).exit) == len(DEFAULT_EXIT_RULES)
@@ -0,0 +1,41 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from conservative_config import CONFIG
+from replay import ReplayClock, ReplayDataSource
+from streaming import ReplayFeed, StreamingTrader, bars_to_ticks
+
+
+def nse_hourly_bars(days):
+    """Hourly bars for the NSE session, 09:15 to 15:15 IST, on business days"""
+    starts = [day + pd.Timedelta(hours=hour, minutes=15)
+              for day in pd.bdate_range('2024-01-01', periods=days, tz='Asia/Kolkata')
+              for hour in range(9, 16)]
+    index = pd.DatetimeIndex(starts).tz_convert('UTC')
+    close = 1000 + np.cumsum(np.random.default_rng(0).normal(0, 2, len(index)))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': 1000.0}, index=index)
+
+
+def test_nse_candles_start_at_session_open(tmp_path):
+    df = nse_hourly_bars(40)
+    warm, live = df.iloc[:-14], df.iloc[-14:]
+    config = dict(CONFIG, symbol='TCS.NS', timeframe='1h',
+                  account_file=str(tmp_path / 'account.json'),
+                  trade_journal=str(tmp_path / 'journal.jsonl'),
+                  indicator_checkpoint=str(tmp_path / 'indicator_state.npz'))
+    clock = ReplayClock(warm.index[-1] + pd.Timedelta(minutes=30))
+    trader = StreamingTrader(config, ReplayDataSource({('TCS.NS', '1h'): df}, clock))
+    trader.now = clock.now
+
+    asyncio.run(trader.run_stream(ReplayFeed(bars_to_ticks(live))))
+
+    # The warmed candle is continued by the ticks in its hour, and every live
+    # candle covers exactly one exchange bar
+    candles = pd.DatetimeIndex([candle[1] for candle in trader.candles])
+    assert candles.is_unique
+    assert list(candles[-len(live):]) == list(live.index)
+    assert (candles.tz_convert('Asia/Kolkata').minute == 15).all()
+    assert trader.indicator_engine.last_timestamp == live.index[-1]
@@ -0,0 +1,126 @@
+import json
+import os
+
+from metrics import METRICS
+
+
+def empty_summary():
+    return {
+        'total_trades': 0,
+        'winning_trades': 0,
+        'losing_trades': 0,
+        'total_profit': 0,
+        'win_rate': 0
+    }
+
+
+def update_summary(summary, trade_data):
+    """Fold one trade into the running summary (only SELL trades count)"""
+    if trade_data['type'] == 'SELL':
+        summary['total_trades'] += 1
+        profit = trade_data.get('profit', 0)
+        if profit > 0:
+            summary['winning_trades'] += 1
+        else:
+            summary['losing_trades'] += 1
+        summary['total_profit'] += profit
+        summary['win_rate'] = (summary['winning_trades'] / summary['total_trades']) * 100
+    return summary
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over path; returns bytes written"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class TradeJournal:
+    """Append-only JSON Lines journal: one trade plus the account state after it per line"""
+
+    def __init__(self, path='trade_journal.jsonl'):
+        self.path = path
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def append(self, trade_data, balance=None, positions=None):
+        """Append one record with a single write and fsync; returns the new journal size"""
+        record = {'trade': trade_data}
+        if balance is not None:
+            record['balance'] = balance
+            record['positions'] = positions
+        line = (json.dumps(record) + '\n').encode()
+        with METRICS.stage('write_journal'), open(self.path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            METRICS.count('bytes_journal', len(line))
+            return f.tell()
+
+    def read(self, offset=0):
+        """Yield (record, end_offset) for every complete line after offset"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                # A line without a newline was torn by a crash mid-append
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                yield json.loads(line), offset
+
+    def trades(self):
+        """Iterate over the full trade history without loading it into memory"""
+        for record, _ in self.read():
+            yield record['trade']
+
+    def repair(self):
+        """Drop a torn last line so the next append starts on a clean line"""
+        size = self.size()
+        if not size:
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+            # Walk back to the last complete line
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def recover(self, account, chunk_size=10_000):
+        """Bring a snapshot up to date with journal records written after it"""
+        # analytics reads journals itself, so it is imported here rather than at the top
+        from analytics import update_analytics
+        self.repair()
+        offset = account.get('journal_offset', 0)
+        trades = []
+        for record, offset in self.read(offset):
+            update_summary(account['summary'], record['trade'])
+            if 'balance' in record:
+                account['balance'] = record['balance']
+                account['positions'] = record['positions']
+            if 'analytics' in account:
+                trades.append(record['trade'])
+                if len(trades) >= chunk_size:
+                    update_analytics(account['analytics'], trades)
+                    trades = []
+        if trades:
+            update_analytics(account['analytics'], trades)
+        account['journal_offset'] = offset
+        return account
@@ -1,142 +1,336 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import itertools
 import time
 import json
 import os
-import ta
+
+from bar_store import BarStore, CachedDataSource, ResampledDataSource, bucket_origin, bucket_starts
+from bar_window import BarWindow
+from data_client import DataClient, YahooChartSource, backoff_delay
+from fill_simulator import BUY, SELL, FillSimulator
+from indicator_engine import IncrementalIndicators
+from metrics import METRICS
+from risk import ATR, RiskEngine
+from rules import RuleSet
+from trade_journal import TradeJournal, empty_summary, update_summary, write_json_atomic
+from analytics import analyze_trades, empty_analytics, update_analytics
+
+# Bars generate_signals looks at: 10 ATRs for volatility, plus highs a trailing stop missed while down
+SIGNAL_LOOKBACK = 20
+
+
+def wilder_atr(high, low, close, window):
+    """Average True Range with Wilder smoothing, matching ta's average_true_range"""
+    prev_close = close.shift(1)
+    true_range = pd.concat(
+        [high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1
+    ).max(axis=1)
+    atr = np.zeros(len(close))
+    if len(close) >= window:
+        # Seed with the simple mean, then (atr * (n - 1) + tr) / n == ewm(alpha=1/n)
+        seeded = true_range.iloc[window - 1:].copy()
+        seeded.iloc[0] = true_range.iloc[:window].mean()
+        atr[window - 1:] = seeded.ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+    return pd.Series(atr, index=close.index)
+
+
+def trend_ema(close, interval, span, origin=0):
+    """EMA of higher-timeframe closes as seen at each bar
+
+    The higher-timeframe bar a row falls in is still forming, so its close is the
+    row's own close; earlier higher-timeframe bars are complete. Matches
+    close.resample(interval).last().ewm(span=span).mean() evaluated bar by bar,
+    with intraday buckets aligned to origin (bar_store.bucket_origin).
+    """
+    values = close.to_numpy(dtype=float)
+    buckets = bucket_starts(close.index, interval, origin)
+    new_bucket = np.r_[True, buckets[1:] != buckets[:-1]]
+    bucket = np.cumsum(new_bucket) - 1
+    last_rows = np.r_[np.flatnonzero(new_bucket)[1:] - 1, len(values) - 1]
+    completed = pd.Series(values[last_rows]).ewm(span=span).mean().to_numpy()
+
+    # ewm(adjust=True) weights: total weight of k + 1 observations is (1 - decay**(k + 1)) / alpha
+    alpha = 2 / (span + 1)
+    decay = 1 - alpha
+    prior_weight = decay * (1 - decay ** bucket) / alpha
+    prior = np.where(bucket > 0, completed[np.maximum(bucket - 1, 0)], 0.0)
+    return pd.Series((prior_weight * prior + values) / (prior_weight + 1), index=close.index)
+
 
 class AlgoTrader:
-    def __init__(self, config):
+    def __init__(self, config, data_source=None, account=None):
         self.config = config
         self.symbol = config['symbol']
         self.timeframe = config['timeframe']
         self.risk_percent = config['risk_percent']
+        self.leverage = config.get('leverage', 1)
+        
+        # Bars are read from the local cache; only the missing tail is downloaded
+        if data_source is None:
+            # Downloads go through a pooled, rate-limited client with retries and a circuit breaker
+            data_source = CachedDataSource(YahooChartSource(DataClient.from_config(config)),
+                                           BarStore(config.get('data_cache_dir', 'data_cache')))
+            # Store only the base resolution and aggregate coarser bars from it
+            if config.get('base_timeframe', self.timeframe) != self.timeframe:
+                data_source = ResampledDataSource(data_source, config['base_timeframe'])
+        self.data_source = data_source
+        
+        # Entry and exit rules, compiled once (see rules.py)
+        self.rules = RuleSet.from_config(config)
+        
+        # Fees, slippage and latency of simulated fills; free and instant unless configured
+        self.fill_simulator = FillSimulator.from_config(config)
+        
+        # Position sizing, portfolio limits and trailing stops (see risk.py)
+        self.risk = RiskEngine.from_config(config)
+        
+        # Trades are appended to the journal; the account file is a small snapshot
+        self.account_file = config.get('account_file', 'paper_account.json')
+        self.journal = TradeJournal(config.get('trade_journal', 'trade_journal.jsonl'))
+        
+        # Initialize account (a portfolio passes one account shared by all symbols)
+        if account is None:
+            account = self.load_account_state(config['initial_balance'])
+        self.account = account
         
-        # Initialize account
-        self.account = self.load_account_state(config['initial_balance'])
+        # Per-stage timings and byte counts (see metrics.py)
+        if config.get('metrics'):
+            METRICS.enable()
+        
+        # Incremental indicators are only kept by run(); batch callers recompute
+        self.indicator_engine = None
+        self.indicator_checkpoint = config.get('indicator_checkpoint', 'indicator_state.npz')
+        
+        # Optional compact storage: a fixed window of bars and indicators updated in place
+        self.bar_window = None
+        if config.get('compact_window'):
+            self.bar_window = BarWindow.for_config(config, config['compact_window'],
+                                                   np.dtype(config.get('compact_dtype', 'float32')))
         
     def load_account_state(self, initial_balance):
         """Load or create paper trading account"""
         try:
-            if os.path.exists('paper_account.json'):
-                with open('paper_account.json', 'r') as f:
+            if os.path.exists(self.account_file):
+                with open(self.account_file, 'r') as f:
                     data = f.read().strip()  # Remove any whitespace
                     if not data:  # If file is empty
                         return self.create_initial_account(initial_balance)
-                    return json.loads(data)
+                    account = json.loads(data)
+                return self.restore_account(account)
             return self.create_initial_account(initial_balance)
         except json.JSONDecodeError:
             print("Error reading account state, creating new account")
             return self.create_initial_account(initial_balance)
     
+    def restore_account(self, account):
+        """Replay journal records newer than the snapshot and migrate the old file layout"""
+        legacy_history = account.pop('trade_history', [])
+        if 'summary' not in account:
+            account['summary'] = self.load_legacy_summary()
+        if legacy_history:
+            # Older snapshots embedded the whole history; move it into the journal once
+            for trade in legacy_history:
+                account['journal_offset'] = self.journal.append(trade)
+        rebuild = 'analytics' not in account
+        if rebuild:
+            # Snapshots from before analytics: stream the journal up to the snapshot once to build it
+            offset = account.get('journal_offset', 0)
+            trades = (record['trade'] for record, end in
+                      itertools.takewhile(lambda item: item[1] <= offset, self.journal.read()))
+            account['analytics'] = analyze_trades(trades, self.config['initial_balance'])
+        self.journal.recover(account)
+        
+        # Only trades made since startup are kept in memory
+        account['trade_history'] = []
+        if legacy_history or rebuild:
+            self.save_account_state(account)
+        return account
+    
+    def load_legacy_summary(self):
+        """Read the summary from an old trade_results.json, if there is one"""
+        try:
+            if os.path.exists('trade_results.json'):
+                with open('trade_results.json', 'r') as f:
+                    return json.load(f)['summary']
+        except (json.JSONDecodeError, KeyError):
+            print("Error reading trade_results.json, starting a new summary")
+        return empty_summary()
+    
     def create_initial_account(self, initial_balance):
         """Create a new account with initial balance"""
         account = {
             'balance': initial_balance,
             'positions': {},
+            'summary': empty_summary(),
+            'analytics': empty_analytics(initial_balance),
             'trade_history': []
         }
         self.save_account_state(account)
         return account
     
     def save_account_state(self, account_state):
-        """Save account state to file"""
-        with open('paper_account.json', 'w') as f:
-            json.dump(account_state, f, indent=4)
+        """Atomically save the account snapshot; the trade history lives in the journal"""
+        snapshot = {key: value for key, value in account_state.items() if key != 'trade_history'}
+        snapshot['journal_offset'] = self.journal.size()
+        with METRICS.stage('write_account'):
+            METRICS.count('bytes_account', write_json_atomic(self.account_file, snapshot))
+    
+    def now(self):
+        """Current UTC time; replays substitute a simulated clock"""
+        return datetime.now(timezone.utc)
     
     def get_historical_data(self):
-        """Fetch historical data from Yahoo Finance"""
-        ticker = yf.Ticker(self.symbol)
-        end = datetime.now()
+        """Fetch historical data from the local cache, topped up from Yahoo Finance"""
+        end = self.now()
         # Increased history for 1H timeframe
         start = end - timedelta(days=30)  # 30 days of history for better analysis
-        df = ticker.history(start=start, end=end, interval=self.timeframe)
+        resume = self.resume_start(start)
+        if resume is not None:
+            print(f"Resuming indicators from checkpoint at {self.indicator_engine.last_timestamp}")
+            start = resume
+        df = self.data_source.get_bars(self.symbol, self.timeframe, start, end)
         
         if df.empty:
             raise ValueError("No data received from Yahoo Finance")
         return df
     
-    def calculate_indicators(self, df):
-        """Calculate technical indicators"""
+    def resume_start(self, start):
+        """First bar to fetch when the indicator checkpoint can be resumed, else None
+        
+        The engine keeps outputs for its last few bars, which is all generate_signals
+        reads, so only those and newer bars are needed. A checkpoint older than the
+        history window is stale and the full window is fetched and replayed instead.
+        """
+        engine = self.indicator_engine
+        if engine is None or engine.last_timestamp is None:
+            return None
+        if self.config.get('trend_timeframe'):
+            # The higher-timeframe EMA is computed over the whole fetched history
+            return None
+        start = BarStore.to_utc(start)
+        oldest = BarStore.to_utc(engine.resume_from())
+        if BarStore.to_utc(engine.last_timestamp) < start or oldest <= start:
+            return None
+        return oldest.to_pydatetime()
+    
+    def calculate_indicators(self, df, cache=None):
+        """Calculate technical indicators
+        
+        A cache dict (only valid for one set of fetched bars) lets several configs
+        reuse columns whose parameters they share, keyed by symbol, timeframe,
+        indicator name and parameters.
+        """
+        # Optional higher-timeframe trend EMA, aggregated from the same bars
+        trend_timeframe = self.config.get('trend_timeframe')
+        ema_trend = self.config.get('ema_trend')
+        origin = bucket_origin(self.symbol)
+        
+        if self.bar_window is not None:
+            # Only bars from the last stored one on are written and fed to the engine
+            if self.indicator_engine is None:
+                self.indicator_engine = IncrementalIndicators(self.config)
+            first = self.bar_window.merge(df)
+            window = self.indicator_engine.apply_window(self.bar_window, first)
+            if trend_timeframe:
+                close = pd.Series(window.column('Close'), index=window.index)
+                window.column('ema_trend')[:] = trend_ema(close, trend_timeframe, ema_trend, origin)
+            return window
+        
+        if self.indicator_engine is not None:
+            df = self.indicator_engine.apply(df)
+            if trend_timeframe:
+                df['ema_trend'] = trend_ema(df['Close'], trend_timeframe, ema_trend, origin)
+            return df
+        
+        # ta is only needed here; the incremental engine paths never import it
+        import ta
+        
+        if cache is None:
+            cache = {}
+        
+        def cached(key, compute):
+            key = (self.symbol, self.timeframe) + key
+            if key in cache:
+                METRICS.count('indicators_reused')
+            else:
+                cache[key] = compute()
+            return cache[key]
+        
+        close = df['Close']
+        ema_fast = self.config['ema_fast']
+        ema_slow = self.config['ema_slow']
+        rsi_period = self.config['rsi_period']
+        atr_period = self.config['atr_period']
+        columns = {}
+        
         # Trend Indicators
-        df[f"ema_{self.config['ema_fast']}"] = df['Close'].ewm(span=self.config['ema_fast']).mean()
-        df[f"ema_{self.config['ema_slow']}"] = df['Close'].ewm(span=self.config['ema_slow']).mean()
-        df['sma_20'] = df['Close'].rolling(window=20).mean()
+        columns[f"ema_{ema_fast}"] = cached(('ema', ema_fast), lambda: close.ewm(span=ema_fast).mean())
+        columns[f"ema_{ema_slow}"] = cached(('ema', ema_slow), lambda: close.ewm(span=ema_slow).mean())
+        columns['sma_20'] = cached(('sma', 20), lambda: close.rolling(window=20).mean())
+        if trend_timeframe:
+            columns['ema_trend'] = cached(('trend_ema', trend_timeframe, ema_trend),
+                                          lambda: trend_ema(close, trend_timeframe, ema_trend, origin))
         
         # Momentum
-        df['rsi'] = ta.momentum.rsi(df['Close'], window=self.config['rsi_period'])
-        df['macd'] = ta.trend.macd_diff(df['Close'])
-        df['macd_signal'] = ta.trend.macd_signal(df['Close'])
+        columns['rsi'] = cached(('rsi', rsi_period), lambda: ta.momentum.rsi(close, window=rsi_period))
+        columns['macd'] = cached(('macd_diff', 12, 26, 9), lambda: ta.trend.macd_diff(close))
+        columns['macd_signal'] = cached(('macd_signal', 12, 26, 9), lambda: ta.trend.macd_signal(close))
         
         # Volatility
-        df['atr'] = ta.volatility.average_true_range(
-            df['High'], 
-            df['Low'], 
-            df['Close'],
-            window=self.config['atr_period']
-        )
+        columns['atr'] = cached(('atr', atr_period),
+                                lambda: wilder_atr(df['High'], df['Low'], close, atr_period))
         
         # Bollinger Bands
-        indicator_bb = ta.volatility.BollingerBands(close=df['Close'], window=20, window_dev=2)
-        df['bb_upper'] = indicator_bb.bollinger_hband()
-        df['bb_middle'] = indicator_bb.bollinger_mavg()
-        df['bb_lower'] = indicator_bb.bollinger_lband()
+        indicator_bb = cached(('bollinger', 20, 2),
+                              lambda: ta.volatility.BollingerBands(close=close, window=20, window_dev=2))
+        columns['bb_upper'] = indicator_bb.bollinger_hband()
+        columns['bb_middle'] = indicator_bb.bollinger_mavg()
+        columns['bb_lower'] = indicator_bb.bollinger_lband()
         
         # Volume
-        df['volume_sma'] = df['Volume'].rolling(window=20).mean()
-        df['volume_ratio'] = df['Volume'] / df['volume_sma']
+        columns['volume_sma'] = cached(('volume_sma', 20), lambda: df['Volume'].rolling(window=20).mean())
+        columns['volume_ratio'] = df['Volume'] / columns['volume_sma']
         
-        return df
+        # Assign all columns at once instead of growing df one column at a time
+        return df.assign(**columns)
+    
+    def buy_conditions(self, df):
+        """Weighted count of the entry rules met on every bar"""
+        return pd.Series(self.rules.evaluate(df)['score'], index=df.index)
+    
+    def exit_conditions(self, df):
+        """Flag bars where the indicator-based sell rules fire"""
+        return pd.Series(self.rules.evaluate(df)['exits'], index=df.index)
     
     def generate_signals(self, df):
         """Generate trading signals based on config"""
+        if isinstance(df, BarWindow):
+            # Evaluate on a small float64 frame of the latest bars and store the result
+            recent = self.generate_signals(df.frame(max(SIGNAL_LOOKBACK, self.rules.lookback + 1)))
+            df.set(len(df) - 1, {'signal': recent['signal'].iloc[-1]})
+            return df
+        
         df['signal'] = 0
-        conditions_met = 0
+        
+        # Only the last bar is evaluated, on the few rows its rules look back over
+        latest = self.rules.evaluate(df, last=True)
         
         # Don't generate buy signals if we already have a position
         if self.symbol in self.account['positions']:
             # Check for sell signals only
-            if (df['rsi'].iloc[-1] > self.config['rsi_overbought'] or 
-                df['Close'].iloc[-1] < df[f"ema_{self.config['ema_fast']}"].iloc[-1] or
+            if (latest['exits'][0] or
                 self.check_profit_target(df) or 
                 self.check_stop_loss(df)):
                 df.iloc[-1, df.columns.get_loc('signal')] = -1
             return df
         
         # Continue with buy signal generation if no position...
-        # 1. Trend Condition
-        trend_condition = (
-            (df['Close'] > df[f"ema_{self.config['ema_fast']}"]) & 
-            (df[f"ema_{self.config['ema_fast']}"] > df[f"ema_{self.config['ema_slow']}"])
-        )
-        if trend_condition.iloc[-1]:
-            conditions_met += 1
-            
-        # 2. Momentum Condition
-        momentum_condition = (
-            (df['rsi'] < self.config['rsi_oversold']) |
-            (df['macd'] > df['macd_signal'])
-        )
-        if momentum_condition.iloc[-1]:
-            conditions_met += 1
+        conditions_met = latest['score'][0]
             
-        # 3. Volume Condition
-        volume_condition = df['volume_ratio'] > self.config['volume_threshold']
-        if volume_condition.iloc[-1]:
-            conditions_met += 1
-            
-        # 4. Volatility Condition
-        volatility_condition = (
-            (df['Close'] > df['bb_middle']) &
-            (df['atr'] < df['atr'].rolling(window=10).mean())
-        )
-        if volatility_condition.iloc[-1]:
-            conditions_met += 1
-            
-        # Generate Buy Signal - Fixed boolean indexing
-        if conditions_met >= self.config['min_conditions'] and self.symbol not in self.account['positions']:
+        # Generate Buy Signal: enough conditions met and every required filter passed
+        if latest['entries'][0] and self.symbol not in self.account['positions']:
             df.iloc[-1, df.columns.get_loc('signal')] = 1
         
         # Debug prints
@@ -148,8 +342,9 @@ class AlgoTrader:
         """Print market analysis with INR formatting"""
         latest = df.iloc[-1]
         print("\n=== Market Analysis ===")
+        print(f"Symbol: {self.symbol}")
         print(f"Price: ₹{latest['Close']:,.2f}")
-        print(f"Conditions Met: {conditions_met}/{self.config['min_conditions']}")
+        print(f"Conditions Met: {conditions_met:g}/{self.config['min_conditions']}")
         print(f"RSI: {latest['rsi']:.2f}")
         print(f"Volume Ratio: {latest['volume_ratio']:.2f}x")
         print(f"MACD Signal: {'Bullish' if latest['macd'] > latest['macd_signal'] else 'Bearish'}")
@@ -159,53 +354,83 @@ class AlgoTrader:
         print("=====================\n")
     
     def calculate_position_size(self, entry_price, stop_loss):
-        """Calculate position size based on risk management"""
-        risk_amount = self.account['balance'] * (self.risk_percent / 100)
-        position_size = risk_amount / (entry_price - stop_loss)
-        return position_size
+        """Size that loses risk_percent of the balance if stop_loss is hit (P&L is leveraged)"""
+        return self.risk.stop_size(self.account['balance'], entry_price, stop_loss)
+    
+    def position_size(self, current_price, atr=np.nan):
+        """Size of a new position: fixed or ATR sizing, shrunk to the portfolio limits"""
+        balance = self.account['balance']
+        size = float(self.risk.size_factor(current_price, atr)) * balance
+        if self.risk.sizing == ATR:
+            # A quiet market can ask for more margin than the balance holds: take what it affords
+            fill_price = self.fill_simulator.slippage.price(BUY, current_price, 0.0)
+            size = min(size, balance / (fill_price * (1 / self.leverage + self.fill_simulator.fees.taker_rate)))
+        return self.risk.limit_size(self.account, current_price, size)
     
-    def execute_trade(self, signal, current_price, timestamp):
-        """Execute paper trades with INR values"""
+    def latest_atr(self):
+        """ATR of the latest bar of self.df, or NaN before any bars are loaded"""
+        try:
+            return float(self.df['atr'].iloc[-1])
+        except (AttributeError, KeyError, IndexError):
+            return np.nan
+    
+    def execute_trade(self, signal, current_price, timestamp, volume=None, atr=None):
+        """Execute paper trades with INR values; volume is the bar's, for market impact
+        
+        atr sizes the position and places its trailing stop; it defaults to the
+        latest bar of self.df.
+        """
         try:
             if signal == 1:  # Buy signal
                 if self.symbol not in self.account['positions']:
-                    # Calculate position size with leverage
-                    risk_amount = self.account['balance'] * (self.risk_percent / 100)
-                    leveraged_position = risk_amount * self.config['leverage']
-                    position_size = leveraged_position / current_price
+                    atr = self.latest_atr() if atr is None else atr
+                    position_size = self.position_size(current_price, atr)
+                    if position_size <= 0:
+                        print("Portfolio risk limits reached, skipping BUY")
+                        return
+                    
+                    # Fill at the simulated price: slippage and fees (see fill_simulator.py)
+                    fill = self.fill_simulator.market_fill(self.symbol, BUY, position_size, current_price, volume)
+                    fill_price = fill['price']
                     
                     # Calculate actual cost (margin required)
-                    margin_required = (position_size * current_price) / self.config['leverage']
+                    margin_required = (position_size * fill_price) / self.leverage
                     
-                    if margin_required <= self.account['balance']:
-                        # Update account balance (only deduct margin)
-                        self.account['balance'] -= margin_required
+                    if margin_required + fill['fee'] <= self.account['balance']:
+                        # Update account balance (only deduct margin and fee)
+                        self.account['balance'] -= margin_required + fill['fee']
                         
                         # Record the position
                         self.account['positions'][self.symbol] = {
                             'size': position_size,
-                            'entry_price': current_price,
-                            'stop_loss': current_price * (1 - self.config['stop_loss']/100),
+                            'entry_price': fill_price,
+                            'stop_loss': fill_price * (1 - self.config['stop_loss']/100),
                             'margin': margin_required,
-                            'leverage': self.config['leverage']
+                            'leverage': self.leverage,
+                            'entry_fee': fill['fee']
                         }
+                        self.risk.open_trail(self.account['positions'][self.symbol], current_price, atr, timestamp)
                         
                         print(f"\nExecuting BUY:")
                         print(f"Size: {position_size:.8f} {self.symbol}")
-                        print(f"Price: ₹{current_price:,.2f}")
-                        print(f"Leverage: {self.config['leverage']}x")
-                        print(f"Position Value: ₹{(position_size * current_price):,.2f}")
+                        print(f"Price: ₹{fill_price:,.2f}")
+                        print(f"Leverage: {self.leverage}x")
+                        print(f"Position Value: ₹{(position_size * fill_price):,.2f}")
                         print(f"Margin Required: ₹{margin_required:,.2f}")
+                        if fill['fee']:
+                            print(f"Fee: ₹{fill['fee']:,.2f}")
                         
                         # Save trade to history
                         trade_data = {
                             'timestamp': str(timestamp),
+                            'symbol': self.symbol,
                             'type': 'BUY',
-                            'price': current_price,
+                            'price': fill_price,
                             'size': position_size,
-                            'leverage': self.config['leverage'],
+                            'leverage': self.leverage,
                             'margin': margin_required,
-                            'position_value': position_size * current_price,
+                            'position_value': position_size * fill_price,
+                            'fee': fill['fee'],
                             'balance_after': self.account['balance']
                         }
                         self.account['trade_history'].append(trade_data)
@@ -217,37 +442,46 @@ class AlgoTrader:
             elif signal == -1:  # Sell signal
                 if self.symbol in self.account['positions']:
                     position = self.account['positions'][self.symbol]
-                    close_price = position['size'] * current_price
+                    fill = self.fill_simulator.market_fill(self.symbol, SELL, position['size'], current_price, volume)
+                    fill_price = fill['price']
+                    close_price = position['size'] * fill_price
                     entry_value = position['size'] * position['entry_price']
                     
-                    # Calculate leveraged P&L
+                    # Calculate leveraged P&L, net of the exit fee
                     raw_profit = close_price - entry_value
-                    leveraged_profit = raw_profit * self.config['leverage']
+                    leveraged_profit = raw_profit * self.leverage - fill['fee']
                     
                     # Return margin + profit/loss
                     self.account['balance'] += position['margin'] + leveraged_profit
                     
+                    # The entry fee left the balance on BUY; the trade's P&L is net of both fees
+                    profit = leveraged_profit - position.get('entry_fee', 0.0)
+                    
                     print(f"\nExecuting SELL:")
                     print(f"Size: {position['size']:.8f} {self.symbol}")
-                    print(f"Price: ₹{current_price:,.2f}")
-                    print(f"Leverage: {self.config['leverage']}x")
-                    print(f"P&L: ₹{leveraged_profit:,.2f}")
+                    print(f"Price: ₹{fill_price:,.2f}")
+                    print(f"Leverage: {self.leverage}x")
+                    print(f"P&L: ₹{profit:,.2f}")
+                    if fill['fee']:
+                        print(f"Fee: ₹{fill['fee']:,.2f}")
+                    
+                    # Clear the position before journaling the account state
+                    del self.account['positions'][self.symbol]
                     
                     # Save trade to history
                     trade_data = {
                         'timestamp': str(timestamp),
+                        'symbol': self.symbol,
                         'type': 'SELL',
-                        'price': current_price,
+                        'price': fill_price,
                         'size': position['size'],
-                        'leverage': self.config['leverage'],
-                        'profit': leveraged_profit,
+                        'leverage': self.leverage,
+                        'profit': profit,
+                        'fee': fill['fee'],
                         'balance_after': self.account['balance']
                     }
                     self.account['trade_history'].append(trade_data)
                     self.save_trade_results(trade_data)
-                    
-                    # Clear the position
-                    del self.account['positions'][self.symbol]
             
             # Save updated account state
             self.save_account_state(self.account)
@@ -257,22 +491,8 @@ class AlgoTrader:
             print(f"Error executing trade: {str(e)}")
     
     def save_trade_log(self, trade):
-        """Save individual trade to a separate log file"""
-        log_file = 'trade_log.json'
-        
-        # Load existing logs or create new log array
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                trades = json.load(f)
-        else:
-            trades = []
-        
-        # Add new trade
-        trades.append(trade)
-        
-        # Save updated logs
-        with open(log_file, 'w') as f:
-            json.dump(trades, f, indent=4)
+        """Append an individual trade to the trade journal"""
+        self.journal.append(trade)
     
     def calculate_open_position_pnl(self, current_price):
         """Calculate P&L for open positions"""
@@ -295,81 +515,23 @@ class AlgoTrader:
     def run_once(self):
         """Execute a single iteration of the trading logic"""
         try:
-            print("\nFetching new market data...")
-            self.df = self.get_historical_data()
-            
-            # Verify we got new data
-            current_time = self.df.index[-1]
-            print(f"Latest data timestamp: {current_time}")
-            
-            self.df = self.calculate_indicators(self.df)
-            self.df = self.generate_signals(self.df)
-            
-            # Check for signals
-            current_signal = self.df['signal'].iloc[-1]
-            current_price = float(self.df['Close'].iloc[-1])
-            
-            if current_signal != 0:
-                print(f"Signal detected: {'BUY' if current_signal == 1 else 'SELL'}")
-                self.execute_trade(current_signal, current_price, current_time)
-            else:
-                print("No trading signal")
-            
-            # Calculate and display P&L for open positions
-            pnl_info = self.calculate_open_position_pnl(current_price)
-            if pnl_info:
-                print("\n=== Open Position P&L ===")
-                print(f"Entry Price: ₹{pnl_info['entry_price']:.2f}")
-                print(f"Current Price: ₹{pnl_info['current_price']:.2f}")
-                print(f"Position Size: {pnl_info['position_size']:.8f}")
-                print(f"Unrealized P&L: ₹{pnl_info['unrealized_pnl']:.2f}")
-                print(f"P&L %: {pnl_info['pnl_percentage']:.2f}%")
-                print("========================\n")
-                
-        except Exception as e:
-            print(f"Error occurred: {str(e)}")
-            raise e
-
-    def run(self, continuous_mode=True):
-        """Main trading loop"""
-        print(f"Starting paper trading with ₹{self.account['balance']:,.2f}")
-        print(f"Trading {self.symbol} on {self.timeframe} timeframe")
-        print(f"Strategy Parameters:")
-        print(f"RSI Period: {self.config['rsi_period']}")
-        print(f"EMA Fast: {self.config['ema_fast']}")
-        print(f"EMA Slow: {self.config['ema_slow']}")
-        print(f"ATR Period: {self.config['atr_period']}")
-        print(f"Risk Percent: {self.risk_percent}%")
-        
-        if not continuous_mode:
-            return self.run_once()
-            
-        # Updated sleep times for different timeframes
-        sleep_times = {
-            '1m': 60,
-            '5m': 300,
-            '15m': 900,
-            '30m': 1800,
-            '1h': 3600,
-            '4h': 14400,
-            '1d': 86400
-        }
-        
-        # For 1H timeframe, we'll check a few minutes before the hour
-        base_sleep_time = sleep_times.get(self.timeframe, 3600)
-        check_before = 180  # Check 3 minutes before the hour
-        
-        while True:
-            try:
+            with METRICS.stage('cycle'):
                 print("\nFetching new market data...")
-                self.df = self.get_historical_data()
+                with METRICS.stage('fetch'):
+                    self.df = self.get_historical_data()
+                METRICS.count('rows_fetched', len(self.df))
                 
                 # Verify we got new data
                 current_time = self.df.index[-1]
                 print(f"Latest data timestamp: {current_time}")
                 
-                self.df = self.calculate_indicators(self.df)
-                self.df = self.generate_signals(self.df)
+                with METRICS.stage('indicators'):
+                    self.df = self.calculate_indicators(self.df)
+                if self.indicator_engine is not None:
+                    with METRICS.stage('write_checkpoint'):
+                        self.indicator_engine.save(self.indicator_checkpoint)
+                with METRICS.stage('signals'):
+                    self.df = self.generate_signals(self.df)
                 
                 # Check for signals
                 current_signal = self.df['signal'].iloc[-1]
@@ -377,7 +539,9 @@ class AlgoTrader:
                 
                 if current_signal != 0:
                     print(f"Signal detected: {'BUY' if current_signal == 1 else 'SELL'}")
-                    self.execute_trade(current_signal, current_price, current_time)
+                    with METRICS.stage('execute'):
+                        self.execute_trade(current_signal, current_price, current_time,
+                                           float(self.df['Volume'].iloc[-1]))
                 else:
                     print("No trading signal")
                 
@@ -391,56 +555,79 @@ class AlgoTrader:
                     print(f"Unrealized P&L: ₹{pnl_info['unrealized_pnl']:.2f}")
                     print(f"P&L %: {pnl_info['pnl_percentage']:.2f}%")
                     print("========================\n")
+            
+            if METRICS.enabled:
+                METRICS.write(self.config.get('metrics_file', 'metrics.json'))
                 
-                # Calculate sleep time to wake up before next hour
-                now = datetime.now()
-                next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-                sleep_seconds = (next_hour - now).total_seconds() - check_before
-                
-                print(f"Waiting until next hourly candle (sleeping for {sleep_seconds:.0f} seconds)...")
-                time.sleep(max(60, sleep_seconds))  # Sleep at least 60 seconds
+        except Exception as e:
+            print(f"Error occurred: {str(e)}")
+            raise e
+
+    def run(self, continuous_mode=True):
+        """Main trading loop"""
+        print(f"Starting paper trading with ₹{self.account['balance']:,.2f}")
+        print(f"Trading {self.symbol} on {self.timeframe} timeframe")
+        print(f"Strategy Parameters:")
+        print(f"RSI Period: {self.config['rsi_period']}")
+        print(f"EMA Fast: {self.config['ema_fast']}")
+        print(f"EMA Slow: {self.config['ema_slow']}")
+        print(f"ATR Period: {self.config['atr_period']}")
+        print(f"Risk Percent: {self.risk_percent}%")
+        
+        if METRICS.enabled and self.config.get('metrics_port'):
+            METRICS.serve(self.config['metrics_port'])
+        
+        self.load_indicator_engine()
+        
+        if not continuous_mode:
+            result = self.run_once()
+            if METRICS.enabled:
+                METRICS.print_report()
+            return result
+            
+        failures = 0
+        while True:
+            try:
+                self.run_once()
+                failures = 0
+                self.wait_for_next_candle()
                 
             except Exception as e:
-                print(f"Error occurred: {str(e)}")
-                time.sleep(60)  # Wait a minute before retrying
+                # Back off further after each consecutive failure, with jitter, up to 15 minutes
+                delay = 60 + backoff_delay(failures, 60, 840)
+                failures += 1
+                print(f"Error occurred: {str(e)}, retrying in {delay:.0f}s")
+                time.sleep(delay)
     
-    def save_trade_results(self, trade_data):
-        """Save trade results to JSON file"""
-        results_file = 'trade_results.json'
-        
-        # Load existing results or create new
-        if os.path.exists(results_file):
-            with open(results_file, 'r') as f:
-                results = json.load(f)
-        else:
-            results = {
-                'trades': [],
-                'summary': {
-                    'total_trades': 0,
-                    'winning_trades': 0,
-                    'losing_trades': 0,
-                    'total_profit': 0,
-                    'win_rate': 0
-                }
-            }
+    def load_indicator_engine(self):
+        """Keep indicator state across iterations and scheduled runs"""
+        history = max(50, SIGNAL_LOOKBACK, self.rules.lookback + 1)
+        self.indicator_engine = IncrementalIndicators.load(self.config, self.indicator_checkpoint, history)
+    
+    def wait_for_next_candle(self):
+        """Sleep until a few minutes before the next hourly candle"""
+        check_before = 180  # Check 3 minutes before the hour
+        
+        # Calculate sleep time to wake up before next hour
+        now = datetime.now()
+        next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+        sleep_seconds = (next_hour - now).total_seconds() - check_before
         
-        # Add new trade
-        results['trades'].append(trade_data)
-        
-        # Update summary only for SELL trades
-        if trade_data['type'] == 'SELL':
-            results['summary']['total_trades'] += 1
-            profit = trade_data.get('profit', 0)
-            if profit > 0:
-                results['summary']['winning_trades'] += 1
-            results['summary']['total_profit'] += profit
-            if results['summary']['total_trades'] > 0:
-                results['summary']['win_rate'] = (results['summary']['winning_trades'] / 
-                                                results['summary']['total_trades']) * 100
-        
-        # Save updated results
-        with open(results_file, 'w') as f:
-            json.dump(results, f, indent=4)
+        print(f"Waiting until next hourly candle (sleeping for {sleep_seconds:.0f} seconds)...")
+        time.sleep(max(60, sleep_seconds))  # Sleep at least 60 seconds
+    
+    def save_trade_results(self, trade_data):
+        """Append the trade to the journal, then update the running summary and analytics"""
+        # The journal is the record; everything below is derived from it
+        self.journal.append(trade_data, self.account['balance'], self.account['positions'])
+        update_summary(self.account.setdefault('summary', empty_summary()), trade_data)
+        try:
+            update_analytics(self.account.setdefault('analytics', empty_analytics(self.config['initial_balance'])),
+                             [trade_data])
+        except Exception as e:
+            # Dropped analytics are rebuilt from the journal on the next start
+            print(f"Error updating analytics: {str(e)}")
+            self.account.pop('analytics', None)
     
     def check_profit_target(self, df):
         """Check if profit target is hit"""
@@ -460,13 +647,14 @@ class AlgoTrader:
             entry_price = position['entry_price']
             loss_pct = ((entry_price - current_price) / entry_price) * 100
             
-            # Add trailing stop
+            if loss_pct >= self.config['stop_loss']:
+                return True
+            
+            # Trailing stop kept on the position, advanced by the bars it has not seen yet
             if self.config['trailing_stop']:
-                highest_price = max(df['High'].iloc[-20:])  # Look at last 20 candles
-                trail_loss_pct = ((highest_price - current_price) / highest_price) * 100
-                return loss_pct >= self.config['stop_loss'] or trail_loss_pct >= self.config['stop_loss']
+                return self.risk.update_trailing_stops({self.symbol: position}, {self.symbol: df})[self.symbol]
             
-            return loss_pct >= self.config['stop_loss']
+            return False
         return False
     
     def calculate_current_pnl(self, current_price):